@@ -1,8 +1,306 @@
+import csv
+import json
+import os
 import random
 import shutil
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+# How split_dataset / copy_all_to_total_class materialize files:
+#   copy     - full copies (parallel)
+#   hardlink - hard links, falling back to copies across filesystems
+#   reflink  - copy-on-write clones (btrfs, XFS, APFS...), falling back to copies
+#   manifest - no files at all, only CSV manifests (split_dataset only)
+FILE_MODES = ('copy', 'hardlink', 'reflink', 'manifest')
+
+# Linux ioctl request code for FICLONE (copy-on-write clone of a whole file)
+_FICLONE = 0x40049409
+
+# Near-duplicate threshold: max differing bits between two 64-bit dHashes
+DEFAULT_MAX_HASH_DISTANCE = 4
+
+
+def image_dhash(path: Path, hash_size: int = 8) -> int:
+    """
+    64-bit difference hash (dHash) of an image: near-identical frames map to nearby hashes.
+    
+    Args:
+        path (Path): Image file
+        hash_size (int): Hash grid size (hash_size**2 bits)
+        
+    Returns:
+        int: The hash as an unsigned integer
+    """
+    from PIL import Image
+    
+    with Image.open(path) as img:
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+        pixels = list(small.getdata())
+    
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def group_near_duplicates(hashes: Dict[str, int], max_distance: int = DEFAULT_MAX_HASH_DISTANCE) -> List[List[str]]:
+    """
+    Cluster items whose hashes are within max_distance bits (transitively).
+    
+    Uses multi-index hashing: the 64 bits are cut into max_distance + 1 bands, and by the
+    pigeonhole principle two hashes within max_distance bits share at least one band
+    exactly, so only items in the same band bucket are compared. Items with identical
+    hashes (e.g. runs of unchanged webcam frames) are merged first and compared once,
+    so such runs do not make a bucket quadratic.
+    
+    Args:
+        hashes (Dict[str, int]): Item key -> 64-bit hash
+        max_distance (int): Maximum Hamming distance for two items to be duplicates
+        
+    Returns:
+        List[List[str]]: Groups of keys (singletons included), each sorted, largest first
+    """
+    # Identical hashes are always duplicates: cluster distinct hash values instead of keys
+    keys_by_hash = defaultdict(list)
+    for key in sorted(hashes):
+        keys_by_hash[hashes[key]].append(key)
+    values = sorted(keys_by_hash)
+    parent = list(range(len(values)))
+    
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    n_bands = max_distance + 1
+    band_bits = -(-64 // n_bands)
+    mask = (1 << band_bits) - 1
+    for band in range(n_bands):
+        buckets = defaultdict(list)
+        for i, value in enumerate(values):
+            buckets[(value >> (band * band_bits)) & mask].append(i)
+        for members in buckets.values():
+            for a_pos, a in enumerate(members):
+                for b in members[a_pos + 1:]:
+                    if find(a) != find(b) and bin(values[a] ^ values[b]).count('1') <= max_distance:
+                        parent[find(a)] = find(b)
+    
+    groups = defaultdict(list)
+    for i, value in enumerate(values):
+        groups[find(i)].extend(keys_by_hash[value])
+    return sorted((sorted(group) for group in groups.values()), key=lambda g: (-len(g), g[0]))
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    """Clone src to dst sharing data blocks; raises OSError if unsupported."""
+    import fcntl
+
+    with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            dst.unlink()
+            raise
+    shutil.copystat(src, dst)
+
+
+def _materialize_file(src: Path, dst: Path, mode: str) -> str:
+    """
+    Create dst from src using the given mode, falling back to a copy.
+    
+    Returns:
+        str: The mode actually used ('copy', 'hardlink' or 'reflink')
+    """
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    elif mode == 'reflink':
+        try:
+            _reflink(src, dst)
+            return 'reflink'
+        except (OSError, ImportError):
+            pass
+    shutil.copy2(str(src), str(dst))
+    return 'copy'
+
+
+def _materialize_files(pairs: List[Tuple[Path, Path]], mode: str,
+                       max_workers: Optional[int] = None) -> Tuple[Dict[str, int], List[Tuple[Path, Exception]]]:
+    """
+    Materialize many (src, dst) pairs in a thread pool.
+    
+    Returns:
+        Tuple[Dict[str, int], List[Tuple[Path, Exception]]]: Count per mode actually used, and failures
+    """
+    used = defaultdict(int)
+    failures = []
+
+    def work(pair):
+        try:
+            return pair[0], _materialize_file(pair[0], pair[1], mode), None
+        except (OSError, shutil.Error) as e:
+            return pair[0], None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for src, used_mode, error in pool.map(work, pairs):
+            if error is not None:
+                failures.append((src, error))
+            else:
+                used[used_mode] += 1
+    return dict(used), failures
+
+
+class DatasetIndex:
+    """
+    In-memory index of class folder -> image file names.
+    
+    Each class entry remembers the folder's mtime; a refresh only lists the dataset root
+    and re-scans the class folders whose mtime changed. DatasetManager updates the index
+    directly after its own mutations, so they never trigger a re-scan. When cache_path
+    is given the index is persisted as JSON and reused across runs.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, root: Path, extensions: set, cache_path: Optional[str] = None):
+        """
+        Initialize the index (loading the persisted copy if present and valid).
+        
+        Args:
+            root (Path): Dataset folder containing class subfolders
+            extensions (set): Lower-case image suffixes to index
+            cache_path (Optional[str]): JSON file used to persist the index
+        """
+        self.root = root
+        self.extensions = extensions
+        self.cache_path = Path(cache_path) if cache_path else None
+        self._classes: Dict[str, Dict] = {}
+        self._dirty = False
+        self._load()
+    
+    def _load(self) -> None:
+        if self.cache_path is None or not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable index cache '{self.cache_path}': {e}")
+            return
+        if (data.get('version') != self.VERSION or data.get('root') != str(self.root.resolve())
+                or set(data.get('extensions', [])) != self.extensions):
+            return
+        self._classes = {
+            name: {'mtime_ns': entry['mtime_ns'], 'files': set(entry['files'])}
+            for name, entry in data.get('classes', {}).items()
+        }
+    
+    def save(self) -> None:
+        """Write the index to cache_path (atomically) if it changed."""
+        if self.cache_path is None or not self._dirty:
+            return
+        data = {
+            'version': self.VERSION,
+            'root': str(self.root.resolve()),
+            'extensions': sorted(self.extensions),
+            'classes': {
+                name: {'mtime_ns': entry['mtime_ns'], 'files': sorted(entry['files'])}
+                for name, entry in self._classes.items()
+            },
+        }
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save index cache '{self.cache_path}': {e}")
+    
+    def _scan_class(self, class_path: Path) -> set:
+        with os.scandir(class_path) as entries:
+            return {e.name for e in entries
+                    if e.is_file() and os.path.splitext(e.name)[1].lower() in self.extensions}
+    
+    def refresh(self) -> None:
+        """Pick up external changes: new/removed classes and class folders with a new mtime."""
+        seen = set()
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name.startswith('.'):
+                    continue
+                seen.add(entry.name)
+                mtime_ns = entry.stat().st_mtime_ns
+                cached = self._classes.get(entry.name)
+                if cached is None or cached['mtime_ns'] != mtime_ns:
+                    self._classes[entry.name] = {'mtime_ns': mtime_ns, 'files': self._scan_class(Path(entry.path))}
+                    self._dirty = True
+        
+        for name in list(self._classes):
+            if name not in seen:
+                del self._classes[name]
+                self._dirty = True
+        self.save()
+    
+    def classes(self) -> List[str]:
+        """Return the sorted class names."""
+        return sorted(self._classes)
+    
+    def files(self, class_name: str) -> set:
+        """Return the image file names of a class (empty set for unknown classes)."""
+        entry = self._classes.get(class_name)
+        return entry['files'] if entry else set()
+    
+    def counts(self) -> Dict[str, int]:
+        """Return the number of images per class."""
+        return {name: len(entry['files']) for name, entry in self._classes.items()}
+    
+    def _touch(self, class_name: str) -> None:
+        # Record the folder's current mtime so our own change does not force a re-scan
+        self._classes[class_name]['mtime_ns'] = os.stat(self.root / class_name).st_mtime_ns
+        self._dirty = True
+    
+    def add_class(self, class_name: str) -> None:
+        """Register a (new or existing) class folder created by the manager."""
+        if class_name not in self._classes:
+            self._classes[class_name] = {'mtime_ns': 0, 'files': self._scan_class(self.root / class_name)}
+        self._touch(class_name)
+    
+    def remove_class(self, class_name: str) -> None:
+        """Forget a class folder removed by the manager."""
+        if self._classes.pop(class_name, None) is not None:
+            self._dirty = True
+    
+    def rename_class(self, old_name: str, new_name: str) -> None:
+        """Move an entry after the manager renamed a class folder."""
+        entry = self._classes.pop(old_name, None)
+        if entry is None:
+            self.add_class(new_name)
+            return
+        self._classes[new_name] = entry
+        self._touch(new_name)
+    
+    def add_files(self, class_name: str, names: List[str]) -> None:
+        """Record image files the manager created in a class folder."""
+        self.add_class(class_name)
+        self._classes[class_name]['files'].update(names)
+    
+    def remove_files(self, class_name: str, names: List[str]) -> None:
+        """Record image files the manager removed from a class folder."""
+        if class_name in self._classes:
+            self._classes[class_name]['files'].difference_update(names)
+            self._touch(class_name)
 
 
 class DatasetManager:
@@ -12,18 +310,35 @@ class DatasetManager:
     Handles datasets in folder format where each subfolder represents a class label.
     """
     
-    def __init__(self, dataset_path: str):
+    def __init__(self, dataset_path: str, index_cache: Optional[str] = None,
+                 hash_cache: Optional[str] = None):
         """
         Initialize the DatasetManager.
         
         Args:
             dataset_path (str): Path to the dataset folder containing class subfolders
+            index_cache (Optional[str]): JSON file to persist the directory index across runs
+            hash_cache (Optional[str]): JSON file to persist perceptual hashes across runs
         """
         self.dataset_path = Path(dataset_path)
         if not self.dataset_path.exists():
             raise ValueError(f"Dataset path {dataset_path} does not exist")
         
         self.supported_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+        self.index = DatasetIndex(self.dataset_path, self.supported_extensions, index_cache)
+        self.hash_cache = Path(hash_cache) if hash_cache else None
+        self._hashes: Dict[str, List[int]] = {}
+        if self.hash_cache is not None and self.hash_cache.exists():
+            try:
+                with open(self.hash_cache, 'r') as f:
+                    self._hashes = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable hash cache '{self.hash_cache}': {e}")
+    
+    def _image_files(self, class_name: str) -> List[Path]:
+        """Return the indexed image paths of a class (call index.refresh() first)."""
+        class_path = self.dataset_path / class_name
+        return [class_path / name for name in self.index.files(class_name)]
     
     def get_current_classes(self) -> List[str]:
         """
@@ -32,11 +347,8 @@ class DatasetManager:
         Returns:
             List[str]: List of class names
         """
-        classes = []
-        for item in self.dataset_path.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
-                classes.append(item.name)
-        return sorted(classes)
+        self.index.refresh()
+        return self.index.classes()
     
     def get_class_statistics(self) -> Dict[str, int]:
         """
@@ -45,13 +357,139 @@ class DatasetManager:
         Returns:
             Dict[str, int]: Dictionary mapping class names to image counts
         """
-        stats = {}
-        for class_folder in self.dataset_path.iterdir():
-            if class_folder.is_dir() and not class_folder.name.startswith('.'):
-                image_count = len([f for f in class_folder.iterdir() 
-                                 if f.is_file() and f.suffix.lower() in self.supported_extensions])
-                stats[class_folder.name] = image_count
-        return stats
+        self.index.refresh()
+        return self.index.counts()
+    
+    def compute_image_hashes(self, max_workers: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Compute the perceptual hash of every image, reusing cached hashes of unchanged files.
+        
+        A cached hash is reused while the file's mtime and size are unchanged; the rest are
+        computed in a thread pool (image decoding releases the GIL).
+        
+        Args:
+            max_workers (Optional[int]): Threads used to hash images
+            
+        Returns:
+            Dict[str, Dict[str, int]]: Class name -> {image name -> 64-bit dHash}
+        """
+        self.index.refresh()
+        hashes = defaultdict(dict)
+        todo = []
+        fresh = {}
+        for class_name in self.index.classes():
+            for img_file in self._image_files(class_name):
+                key = f"{class_name}/{img_file.name}"
+                try:
+                    st = img_file.stat()
+                except OSError:
+                    continue
+                cached = self._hashes.get(key)
+                if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    fresh[key] = cached
+                    hashes[class_name][img_file.name] = cached[2]
+                else:
+                    todo.append((class_name, img_file, st))
+        
+        def work(item):
+            class_name, img_file, st = item
+            try:
+                return item, image_dhash(img_file), None
+            except Exception as e:  # PIL raises a variety of errors on corrupt files
+                return item, None, e
+        
+        if todo:
+            try:
+                import PIL  # noqa: F401
+            except ImportError:
+                # Warn once instead of once per image
+                print(f"Warning: Pillow is not installed, {len(todo)} images cannot be hashed (pip install Pillow)")
+                todo = []
+        if todo:
+            print(f"Hashing {len(todo)} images ({len(fresh)} cached)...")
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for (class_name, img_file, st), value, error in pool.map(work, todo):
+                    if error is not None:
+                        print(f"Warning: Could not hash '{class_name}/{img_file.name}': {error}")
+                        continue
+                    fresh[f"{class_name}/{img_file.name}"] = [st.st_mtime_ns, st.st_size, value]
+                    hashes[class_name][img_file.name] = value
+        
+        # Entries of deleted/changed files are dropped by rebuilding the cache from this run
+        changed = len(fresh) != len(self._hashes) or bool(todo)
+        self._hashes = fresh
+        if changed and self.hash_cache is not None:
+            tmp_path = self.hash_cache.with_name(self.hash_cache.name + '.tmp')
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._hashes, f)
+                os.replace(tmp_path, self.hash_cache)
+            except OSError as e:
+                print(f"Warning: Could not save hash cache '{self.hash_cache}': {e}")
+        return dict(hashes)
+    
+    def find_duplicate_groups(self, max_distance: int = DEFAULT_MAX_HASH_DISTANCE,
+                              max_workers: Optional[int] = None) -> Dict[str, List[List[str]]]:
+        """
+        Group near-duplicate images (e.g. consecutive webcam frames) within each class.
+        
+        Args:
+            max_distance (int): Maximum dHash Hamming distance for two images to be duplicates
+            max_workers (Optional[int]): Threads used to hash images
+            
+        Returns:
+            Dict[str, List[List[str]]]: Class name -> groups of image names (singletons included)
+        """
+        return {
+            class_name: group_near_duplicates(class_hashes, max_distance)
+            for class_name, class_hashes in self.compute_image_hashes(max_workers).items()
+        }
+    
+    def remove_near_duplicates(self, class_name: Optional[str] = None,
+                               max_distance: int = DEFAULT_MAX_HASH_DISTANCE,
+                               dry_run: bool = False) -> int:
+        """
+        Keep one image per near-duplicate group and delete the others.
+        
+        Args:
+            class_name (Optional[str]): Only deduplicate this class. If None, all classes.
+            max_distance (int): Maximum dHash Hamming distance for two images to be duplicates
+            dry_run (bool): Only report what would be deleted
+            
+        Returns:
+            int: Number of images deleted (or that would be deleted)
+        """
+        groups_by_class = self.find_duplicate_groups(max_distance)
+        if class_name is not None:
+            if class_name not in groups_by_class:
+                print(f"Error: Class '{class_name}' not found or has no images")
+                return 0
+            groups_by_class = {class_name: groups_by_class[class_name]}
+        
+        total_removed = 0
+        for name, groups in sorted(groups_by_class.items()):
+            # Keep the first frame (by name) of each group
+            redundant = [img for group in groups for img in group[1:]]
+            if dry_run:
+                print(f"  {name}: {len(redundant)} of {sum(len(g) for g in groups)} images are near-duplicates")
+                total_removed += len(redundant)
+                continue
+            
+            class_path = self.dataset_path / name
+            deleted = []
+            for img_name in redundant:
+                try:
+                    (class_path / img_name).unlink()
+                    deleted.append(img_name)
+                except (OSError, PermissionError) as e:
+                    print(f"Warning: Could not delete '{img_name}': {e}")
+            self.index.remove_files(name, deleted)
+            print(f"  {name}: removed {len(deleted)} near-duplicates, {len(groups)} images remaining")
+            total_removed += len(deleted)
+        
+        action = "Would remove" if dry_run else "Removed"
+        print(f"{action} {total_removed} near-duplicate images (max distance {max_distance})")
+        return total_removed
     
     def update_class_label(self, old_label: str, new_label: str) -> bool:
         """
@@ -77,6 +515,7 @@ class DatasetManager:
         
         try:
             old_path.rename(new_path)
+            self.index.rename_class(old_label, new_label)
             print(f"Successfully renamed class '{old_label}' to '{new_label}'")
             return True
         except (OSError, PermissionError) as e:
@@ -105,41 +544,44 @@ class DatasetManager:
         
         # Create target class folder if it doesn't exist
         target_path.mkdir(exist_ok=True)
+        self.index.refresh()
         
+        moved_from, moved_to = [], []
         try:
+            source_names = self.index.files(source_class)
             if image_names is None:
                 # Move all images
-                image_files = [f for f in source_path.iterdir() 
-                             if f.is_file() and f.suffix.lower() in self.supported_extensions]
+                image_files = self._image_files(source_class)
             else:
                 # Move specific images
                 image_files = []
                 for img_name in image_names:
-                    img_path = source_path / img_name
-                    if img_path.exists() and img_path.suffix.lower() in self.supported_extensions:
-                        image_files.append(img_path)
+                    if img_name in source_names:
+                        image_files.append(source_path / img_name)
                     else:
                         print(f"Warning: Image '{img_name}' not found in '{source_class}'")
             
-            moved_count = 0
+            target_names = self.index.files(target_class)
             for img_file in image_files:
                 target_file = target_path / img_file.name
                 # Handle name conflicts
                 counter = 1
-                while target_file.exists():
+                while target_file.name in target_names or target_file.name in moved_to:
                     stem = img_file.stem
                     suffix = img_file.suffix
                     target_file = target_path / f"{stem}_{counter}{suffix}"
                     counter += 1
                 
                 shutil.move(str(img_file), str(target_file))
-                moved_count += 1
+                moved_from.append(img_file.name)
+                moved_to.append(target_file.name)
             
-            print(f"Successfully moved {moved_count} images from '{source_class}' to '{target_class}'")
+            print(f"Successfully moved {len(moved_from)} images from '{source_class}' to '{target_class}'")
             
             # Remove source folder if empty
             if not any(source_path.iterdir()):
                 source_path.rmdir()
+                self.index.remove_class(source_class)
                 print(f"Removed empty folder '{source_class}'")
             
             return True
@@ -147,6 +589,12 @@ class DatasetManager:
         except (OSError, PermissionError, shutil.Error) as e:
             print(f"Error moving images: {e}")
             return False
+        
+        finally:
+            # Keep the index in step with whatever was actually moved
+            if source_path.exists():
+                self.index.remove_files(source_class, moved_from)
+            self.index.add_files(target_class, moved_to)
     
     def create_new_class(self, class_name: str) -> bool:
         """
@@ -166,28 +614,37 @@ class DatasetManager:
         
         try:
             class_path.mkdir()
+            self.index.add_class(class_name)
             print(f"Successfully created new class '{class_name}'")
             return True
         except (OSError, PermissionError) as e:
             print(f"Error creating class: {e}")
             return False
     
-    def copy_all_to_total_class(self, total_class_name: str = "total") -> bool:
+    def copy_all_to_total_class(self, total_class_name: str = "total", mode: str = "copy",
+                                max_workers: Optional[int] = None) -> bool:
         """
         Copy all images from all existing classes into a new class folder.
         
         Args:
             total_class_name (str): Name of the target class to copy all images to (default: "total")
+            mode (str): 'copy', 'hardlink' or 'reflink' (links/clones fall back to copies)
+            max_workers (Optional[int]): Threads used to materialize files
             
         Returns:
             bool: True if successful, False otherwise
         """
+        if mode not in FILE_MODES or mode == 'manifest':
+            print(f"Error: Unsupported mode '{mode}' (use copy, hardlink or reflink)")
+            return False
+        
         target_path = self.dataset_path / total_class_name
         
         # Create target class folder if it doesn't exist
         target_path.mkdir(exist_ok=True)
         
         classes = self.get_current_classes()
+        existing_names = set(self.index.files(total_class_name))
         
         # Filter out the target class itself to avoid copying to itself
         source_classes = [cls for cls in classes if cls != total_class_name]
@@ -199,20 +656,20 @@ class DatasetManager:
         try:
             total_copied = 0
             copy_stats = {}
+            mode_stats = defaultdict(int)
+            reserved = set()
             
             for class_name in source_classes:
-                class_path = self.dataset_path / class_name
-                
                 # Get all image files in the class
-                image_files = [f for f in class_path.iterdir() 
-                             if f.is_file() and f.suffix.lower() in self.supported_extensions]
+                image_files = self._image_files(class_name)
                 
                 if not image_files:
                     print(f"Warning: No images found in class '{class_name}', skipping...")
                     copy_stats[class_name] = 0
                     continue
                 
-                copied_count = 0
+                # Resolve target names up front so files can be materialized in parallel
+                pairs = []
                 for img_file in image_files:
                     # Create a unique name by prefixing with the original class name
                     new_name = f"{class_name}_{img_file.name}"
@@ -220,24 +677,30 @@ class DatasetManager:
                     
                     # Handle name conflicts by adding a counter
                     counter = 1
-                    while target_file.exists():
+                    while new_name in existing_names or target_file in reserved:
                         stem = img_file.stem
                         suffix = img_file.suffix
                         new_name = f"{class_name}_{stem}_{counter}{suffix}"
                         target_file = target_path / new_name
                         counter += 1
-                    
-                    try:
-                        shutil.copy2(str(img_file), str(target_file))
-                        copied_count += 1
-                        total_copied += 1
-                    except (OSError, PermissionError, shutil.Error) as e:
-                        print(f"Warning: Could not copy '{img_file.name}' from '{class_name}': {e}")
+                    reserved.add(target_file)
+                    pairs.append((img_file, target_file))
+                
+                used_modes, failures = _materialize_files(pairs, mode, max_workers)
+                for img_file, e in failures:
+                    print(f"Warning: Could not copy '{img_file.name}' from '{class_name}': {e}")
+                failed = {img_file for img_file, _ in failures}
+                self.index.add_files(total_class_name, [dst.name for src, dst in pairs if src not in failed])
                 
+                copied_count = len(pairs) - len(failures)
+                total_copied += copied_count
+                for used_mode, count in used_modes.items():
+                    mode_stats[used_mode] += count
                 copy_stats[class_name] = copied_count
                 print(f"Copied {copied_count} images from class '{class_name}'")
             
             print(f"\nSuccessfully created '{total_class_name}' class with {total_copied} total images")
+            print("Files created by: " + ", ".join(f"{m}={n}" for m, n in sorted(mode_stats.items())))
             print("Copy statistics:")
             for class_name, count in copy_stats.items():
                 if count > 0:
@@ -270,8 +733,8 @@ class DatasetManager:
             return False
         
         # Get all image files in the class
-        image_files = [f for f in class_path.iterdir() 
-                      if f.is_file() and f.suffix.lower() in self.supported_extensions]
+        self.index.refresh()
+        image_files = self._image_files(class_name)
         
         if not image_files:
             print(f"Error: No images found in class '{class_name}'")
@@ -282,9 +745,8 @@ class DatasetManager:
                 # Delete specific images
                 files_to_delete = []
                 for img_name in specific_images:
-                    img_path = class_path / img_name
-                    if img_path.exists() and img_path.suffix.lower() in self.supported_extensions:
-                        files_to_delete.append(img_path)
+                    if img_name in self.index.files(class_name):
+                        files_to_delete.append(class_path / img_name)
                     else:
                         print(f"Warning: Image '{img_name}' not found in '{class_name}'")
             else:
@@ -307,24 +769,24 @@ class DatasetManager:
                     files_to_delete = image_files[:num_images]
             
             # Delete the selected files
-            deleted_count = 0
+            deleted = []
             for img_file in files_to_delete:
                 try:
                     img_file.unlink()
-                    deleted_count += 1
+                    deleted.append(img_file.name)
                 except (OSError, PermissionError) as e:
                     print(f"Warning: Could not delete '{img_file.name}': {e}")
+            self.index.remove_files(class_name, deleted)
             
-            print(f"Successfully deleted {deleted_count} images from class '{class_name}'")
+            print(f"Successfully deleted {len(deleted)} images from class '{class_name}'")
             
             # Check if class folder is now empty
-            remaining_files = [f for f in class_path.iterdir() 
-                             if f.is_file() and f.suffix.lower() in self.supported_extensions]
+            remaining = len(self.index.files(class_name))
             
-            if not remaining_files:
+            if not remaining:
                 print(f"Class '{class_name}' now has no images remaining")
             else:
-                print(f"Class '{class_name}' now has {len(remaining_files)} images remaining")
+                print(f"Class '{class_name}' now has {remaining} images remaining")
             
             return True
             
@@ -334,7 +796,10 @@ class DatasetManager:
     
     def split_dataset(self, output_path: str, dataset_name: str, 
                      train_ratio: float = 0.7, val_ratio: float = 0.2, 
-                     test_ratio: float = 0.1, random_seed: Optional[int] = None) -> bool:
+                     test_ratio: float = 0.1, random_seed: Optional[int] = None,
+                     mode: str = "copy", max_workers: Optional[int] = None,
+                     group_duplicates: bool = False,
+                     max_distance: int = DEFAULT_MAX_HASH_DISTANCE) -> bool:
         """
         Split the dataset into train/validation/test sets.
         
@@ -345,6 +810,11 @@ class DatasetManager:
             val_ratio (float): Proportion for validation set (default: 0.2)
             test_ratio (float): Proportion for test set (default: 0.1)
             random_seed (Optional[int]): Random seed for reproducible splits
+            mode (str): 'copy', 'hardlink', 'reflink' or 'manifest' (see FILE_MODES)
+            max_workers (Optional[int]): Threads used to materialize files
+            group_duplicates (bool): Keep near-duplicate images (same perceptual-hash cluster)
+                in the same split so they cannot leak between train/val/test
+            max_distance (int): Maximum dHash Hamming distance for grouping duplicates
             
         Returns:
             bool: True if successful, False otherwise
@@ -354,6 +824,10 @@ class DatasetManager:
             print("Error: Train, validation, and test ratios must sum to 1.0")
             return False
         
+        if mode not in FILE_MODES:
+            print(f"Error: Unsupported mode '{mode}' (use one of {', '.join(FILE_MODES)})")
+            return False
+        
         if random_seed is not None:
             random.seed(random_seed)
         
@@ -364,58 +838,103 @@ class DatasetManager:
         
         try:
             # Create output directories
-            for split_dir in [train_dir, val_dir, test_dir]:
-                split_dir.mkdir(parents=True, exist_ok=True)
+            if mode == 'manifest':
+                output_base.mkdir(parents=True, exist_ok=True)
+            else:
+                for split_dir in [train_dir, val_dir, test_dir]:
+                    split_dir.mkdir(parents=True, exist_ok=True)
             
             classes = self.get_current_classes()
             if not classes:
                 print("Error: No classes found in the dataset")
                 return False
             
+            duplicate_groups = self.find_duplicate_groups(max_distance, max_workers) if group_duplicates else {}
+            
             total_images = 0
             split_stats = defaultdict(lambda: {'train': 0, 'val': 0, 'test': 0})
+            pairs = []
+            manifest_rows = {'train': [], 'val': [], 'test': []}
             
             for class_name in classes:
-                class_path = self.dataset_path / class_name
-                
-                # Get all image files in the class
-                image_files = [f for f in class_path.iterdir() 
-                             if f.is_file() and f.suffix.lower() in self.supported_extensions]
+                # Get all image files in the class (sorted so seeded splits are reproducible)
+                image_files = sorted(self._image_files(class_name))
                 
                 if not image_files:
                     print(f"Warning: No images found in class '{class_name}', skipping...")
                     continue
                 
-                # Shuffle images for random splitting
-                random.shuffle(image_files)
-                
                 n_images = len(image_files)
                 n_train = int(n_images * train_ratio)
                 n_val = int(n_images * val_ratio)
                 n_test = n_images - n_train - n_val  # Ensure all images are used
                 
+                if group_duplicates:
+                    # Shuffle whole duplicate clusters and fill each split up to its quota
+                    class_path = self.dataset_path / class_name
+                    groups = [[class_path / name for name in group]
+                              for group in duplicate_groups.get(class_name, [])]
+                    # Images that could not be hashed are split as singletons
+                    grouped = {img for group in groups for img in group}
+                    groups.extend([img] for img in image_files if img not in grouped)
+                    random.shuffle(groups)
+                    quotas = {'train': n_train, 'val': n_val, 'test': n_test}
+                    assigned = {'train': [], 'val': [], 'test': []}
+                    for group in groups:
+                        split_name = max(quotas, key=lambda s: quotas[s] - len(assigned[s]))
+                        assigned[split_name].extend(group)
+                    train_files, val_files, test_files = assigned['train'], assigned['val'], assigned['test']
+                else:
+                    # Shuffle images for random splitting
+                    random.shuffle(image_files)
+                    train_files = image_files[:n_train]
+                    val_files = image_files[n_train:n_train + n_val]
+                    test_files = image_files[n_train + n_val:n_train + n_val + n_test]
+                
                 # Create class directories in each split
-                for split_dir in [train_dir, val_dir, test_dir]:
-                    (split_dir / class_name).mkdir(exist_ok=True)
+                if mode != 'manifest':
+                    for split_dir in [train_dir, val_dir, test_dir]:
+                        (split_dir / class_name).mkdir(exist_ok=True)
                 
-                # Copy images to respective splits
+                # Assign images to respective splits
                 splits = [
-                    (image_files[:n_train], train_dir / class_name, 'train'),
-                    (image_files[n_train:n_train + n_val], val_dir / class_name, 'val'),
-                    (image_files[n_train + n_val:n_train + n_val + n_test], test_dir / class_name, 'test')
+                    (train_files, train_dir / class_name, 'train'),
+                    (val_files, val_dir / class_name, 'val'),
+                    (test_files, test_dir / class_name, 'test')
                 ]
                 
                 for images, target_dir, split_name in splits:
                     for img_file in images:
-                        shutil.copy2(str(img_file), str(target_dir / img_file.name))
+                        if mode == 'manifest':
+                            manifest_rows[split_name].append((str(img_file.resolve()), class_name))
+                        else:
+                            pairs.append((img_file, target_dir / img_file.name))
                     split_stats[class_name][split_name] = len(images)
                 
                 total_images += n_images
             
+            if mode == 'manifest':
+                for split_name, rows in manifest_rows.items():
+                    with open(output_base / f"{split_name}.csv", 'w', newline='') as f:
+                        writer = csv.writer(f)
+                        writer.writerow(['path', 'label'])
+                        writer.writerows(rows)
+            else:
+                used_modes, failures = _materialize_files(pairs, mode, max_workers)
+                if failures:
+                    for img_file, e in failures[:10]:
+                        print(f"Error: Could not create '{img_file.name}': {e}")
+                    print(f"Error: {len(failures)} files could not be written")
+                    return False
+            
             # Print statistics
             print("\nDataset split completed successfully!")
             print(f"Output directory: {output_base}")
             print(f"Total images processed: {total_images}")
+            if mode == 'manifest':
+                print("Manifests written: train.csv, val.csv, test.csv (columns: path, label)")
+            else:
+                print("Files created by: " + ", ".join(f"{m}={n}" for m, n in sorted(used_modes.items())))
             print(f"\nSplit ratios: Train={train_ratio:.1%}, Val={val_ratio:.1%}, Test={test_ratio:.1%}")
             print("\nPer-class distribution:")
             print(f"{'Class':<20} {'Train':<8} {'Val':<8} {'Test':<8} {'Total':<8}")
@@ -445,7 +964,9 @@ def main():
         return
     
     try:
-        manager = DatasetManager(dataset_path)
+        manager = DatasetManager(dataset_path,
+                                 index_cache=str(Path(dataset_path) / '.dataset_manager_index.json'),
+                                 hash_cache=str(Path(dataset_path) / '.dataset_manager_hashes.json'))
         
         while True:
             print("\n" + "="*50)
@@ -457,10 +978,11 @@ def main():
             print("5. Delete images from class")
             print("6. Copy all images to 'total' class")
             print("7. Split dataset (train/val/test)")
-            print("8. Exit")
+            print("8. Remove near-duplicate images")
+            print("9. Exit")
             print("="*50)
             
-            choice = input("Enter your choice (1-8): ").strip()
+            choice = input("Enter your choice (1-9): ").strip()
             
             if choice == '1':
                 classes = manager.get_current_classes()
@@ -532,7 +1054,8 @@ def main():
                 
                 confirm = input(f"Copy all images from all classes to '{total_class_name}'? (y/n): ").strip().lower()
                 if confirm == 'y':
-                    manager.copy_all_to_total_class(total_class_name)
+                    mode = input("Mode (copy/hardlink/reflink, default=copy): ").strip().lower() or 'copy'
+                    manager.copy_all_to_total_class(total_class_name, mode=mode)
                 else:
                     print("Operation cancelled")
             
@@ -558,9 +1081,30 @@ def main():
                 seed_input = input("Enter random seed (optional, press Enter to skip): ").strip()
                 random_seed = int(seed_input) if seed_input else None
                 
-                manager.split_dataset(output_path, dataset_name, train_ratio, val_ratio, test_ratio, random_seed)
+                mode = input(f"Split mode ({'/'.join(FILE_MODES)}, default=copy): ").strip().lower() or 'copy'
+                group_duplicates = input("Keep near-duplicate frames in the same split? (y/n, default=n): ").strip().lower() == 'y'
+                
+                manager.split_dataset(output_path, dataset_name, train_ratio, val_ratio, test_ratio, random_seed,
+                                      mode=mode, group_duplicates=group_duplicates)
             
             elif choice == '8':
+                class_name = input("Enter class name (press Enter for all classes): ").strip() or None
+                distance_input = input(f"Max hash distance (default={DEFAULT_MAX_HASH_DISTANCE}): ").strip()
+                try:
+                    max_distance = int(distance_input) if distance_input else DEFAULT_MAX_HASH_DISTANCE
+                except ValueError:
+                    print("Invalid number entered")
+                    continue
+                
+                if manager.remove_near_duplicates(class_name, max_distance, dry_run=True) == 0:
+                    continue
+                confirm = input("Delete these near-duplicates? (y/n): ").strip().lower()
+                if confirm == 'y':
+                    manager.remove_near_duplicates(class_name, max_distance)
+                else:
+                    print("Operation cancelled")
+            
+            elif choice == '9':
                 print("Goodbye!")
                 break
             
@@ -10,6 +10,16 @@ def _split_env_list(name: str, default: list[str]) -> list[str]:
     return [item.strip() for item in val.split(",") if item.strip()]
 
 
+def _parse_env_mapping(name: str) -> dict[str, int]:
+    # "model=N,other=M" -> {"model": N, "other": M}
+    mapping = {}
+    for item in _split_env_list(name, []):
+        key, sep, value = item.rpartition("=")
+        if sep and key.strip():
+            mapping[key.strip()] = int(value)
+    return mapping
+
+
 @dataclass
 class Settings:
     # Server
@@ -20,7 +30,34 @@ class Settings:
 
     # AI / Models
     default_model: str = os.getenv("DEFAULT_MODEL", "gemma3:12b")
+    model_refresh_interval_s: float = float(os.getenv("MODEL_REFRESH_INTERVAL_S", "30"))
     google_api_key: str | None = os.getenv("GOOGLE_API_KEY")
+    gemini_max_concurrency: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+    gemini_timeout_s: float = float(os.getenv("GEMINI_TIMEOUT_S", "30"))
+    gemini_base_url: str | None = os.getenv("GEMINI_BASE_URL")
+
+    # Admission control per model (Ollama processes only a couple of requests at once)
+    model_max_concurrency: int = int(os.getenv("MODEL_MAX_CONCURRENCY", "2"))
+    model_max_queue: int = int(os.getenv("MODEL_MAX_QUEUE", "8"))
+    model_concurrency_overrides: dict[str, int] = field(
+        default_factory=lambda: _parse_env_mapping("MODEL_CONCURRENCY_OVERRIDES")
+    )
+
+    # Images (longest side sent to the vision model; 0 keeps the original)
+    max_upload_bytes: int = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    max_image_side: int = int(os.getenv("MAX_IMAGE_SIDE", "1024"))
+    image_jpeg_quality: int = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+    # Optional ONNX face pre-filter (empty path disables it)
+    face_detector_model: str | None = os.getenv("FACE_DETECTOR_MODEL")
+    face_min_score: float = float(os.getenv("FACE_MIN_SCORE", "0.7"))
+    face_crop_margin: float = float(os.getenv("FACE_CROP_MARGIN", "0.25"))
+    face_detector_threads: int = int(os.getenv("FACE_DETECTOR_THREADS", "2"))
+
+    # Result cache for repeated frames (size 0 disables)
+    result_cache_size: int = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+    result_cache_ttl_s: float = float(os.getenv("RESULT_CACHE_TTL_S", "30"))
+    result_cache_max_distance: int = int(os.getenv("RESULT_CACHE_MAX_DISTANCE", "4"))
 
     # CORS (use default_factory to avoid mutable default issues)
     cors_allow_origins: list[str] = field(default_factory=lambda: _split_env_list("CORS_ALLOW_ORIGINS", ["*"]))
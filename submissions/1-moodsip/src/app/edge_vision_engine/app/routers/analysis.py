@@ -1,12 +1,22 @@
+import json
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+# request.form() yields Starlette's UploadFile; fastapi.UploadFile is only a subclass of it
+from starlette.datastructures import UploadFile
 from app.schemas import AnalyzeRequest, MoodResponse, HealthResponse, ModelsResponse
 from app.config import settings
 from app.services.ai_service import (
-    analyze_mood_with_ai,
-    validate_image_base64,
+    MODEL_REGISTRY,
+    admission_stats,
+    analyze_mood_cached,
+    check_stream_admission,
     list_all_models,
+    list_vision_models,
+    stream_mood_analysis,
 )
+from app.services.face_filter import apply_face_filter
+from app.services.image_service import prepare_image, prepare_image_bytes, validate_image_base64
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +26,11 @@ router = APIRouter(prefix="", tags=["analysis"])
 @router.post("/analyze-mood", response_model=MoodResponse)
 async def analyze_mood(req: AnalyzeRequest):
     try:
-        # Validate that the image is decodable
-        await validate_image_base64(req.image)
-        data = await analyze_mood_with_ai(req.image, req.model or settings.default_model)
-        # Ensure required keys
-        return MoodResponse(**data)
+        # Decode once, validate and downsize to what the vision model needs
+        image = await prepare_image(req.image)
+        # Skip the LLM for frames without a face and send only the face region
+        image = await apply_face_filter(image)
+        return await analyze_mood_cached(image, req.model or settings.default_model)
     except HTTPException:
         raise
     except Exception as e:
@@ -28,37 +38,123 @@ async def analyze_mood(req: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/health", response_model=HealthResponse)
-async def health_check():
-    try:
-        models = await list_all_models()
-        return HealthResponse(
-            status="healthy", ollama_connected=bool(models), available_models=models, default_model=settings.default_model
+async def _read_limited_body(request: Request) -> bytes:
+    """Read the raw body in chunks, failing with 413 as soon as it exceeds max_upload_bytes
+    (also for chunked uploads that send no Content-Length)."""
+    chunks = []
+    total = 0
+    async for chunk in request.stream():
+        total += len(chunk)
+        if total > settings.max_upload_bytes:
+            raise HTTPException(status_code=413, detail="Image too large.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _read_binary_image(request: Request, model: str | None) -> tuple[bytes, str | None]:
+    """Read an image from a multipart form (`image` file, optional `model` field) or a raw image body."""
+    content_length = int(request.headers.get("content-length") or 0)
+    if content_length > settings.max_upload_bytes:
+        raise HTTPException(status_code=413, detail="Image too large.")
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Read the capped body first, then parse it from memory: request.form() alone would
+        # spool an arbitrarily large chunked upload before any size check
+        body = await _read_limited_body(request)
+
+        async def receive() -> dict:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        form = await Request(request.scope, receive).form()
+        try:
+            upload = form.get("image")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=400, detail="Missing 'image' file field.")
+            data = await upload.read()
+            model = form.get("model") or model
+        finally:
+            await form.close()
+    elif content_type.startswith("image/") or content_type.startswith("application/octet-stream"):
+        data = await _read_limited_body(request)
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Use multipart/form-data, image/* or application/octet-stream.",
         )
+
+    if len(data) > settings.max_upload_bytes:
+        raise HTTPException(status_code=413, detail="Image too large.")
+    return data, model
+
+
+@router.post("/analyze-mood/binary", response_model=MoodResponse)
+async def analyze_mood_binary(request: Request, model: str | None = None):
+    """Same as /analyze-mood without the base64/JSON overhead: the image is sent as
+    multipart/form-data or as a raw image/jpeg (image/png, ...) body; `model` is a
+    query parameter or form field."""
+    try:
+        data, model = await _read_binary_image(request, model)
+        image = await prepare_image_bytes(data)
+        image = await apply_face_filter(image)
+        return await analyze_mood_cached(image, model or settings.default_model)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error("Health check failed: %s", e)
+        logger.exception("analyze_mood_binary failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analyze-mood/stream")
+async def analyze_mood_stream(req: AnalyzeRequest):
+    """Server-Sent Events: one `field` event per JSON field as soon as the model writes it,
+    then a final `result` (full MoodResponse) or `error` event. An overloaded model is
+    rejected with 429 + Retry-After before the stream starts."""
+    model = req.model or settings.default_model
+    image = await prepare_image(req.image)
+    image = await apply_face_filter(image)
+    image_hash = await check_stream_admission(image, model)
+
+    async def events():
+        async for event, payload in stream_mood_analysis(image, model, image_hash):
+            if isinstance(payload, MoodResponse):
+                data = payload.model_dump_json()
+            else:
+                data = json.dumps(payload)
+            yield f"event: {event}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/health", response_model=HealthResponse)
+async def health_check():
+    # Answered from the background-refreshed registry: probes never hit Ollama
+    if MODEL_REGISTRY.connected:
         return HealthResponse(
-            status="unhealthy", ollama_connected=False, error="Cannot connect to Ollama.", default_model=settings.default_model
+            status="healthy",
+            ollama_connected=True,
+            available_models=list_all_models(),
+            default_model=settings.default_model,
+            model_queues=admission_stats(),
         )
+    # Connection changes are logged once by the registry refresher, not on every probe
+    logger.debug("Health check: Ollama unreachable (%s)", MODEL_REGISTRY.last_error)
+    return HealthResponse(
+        status="unhealthy",
+        ollama_connected=False,
+        error="Cannot connect to Ollama.",
+        default_model=settings.default_model,
+        model_queues=admission_stats(),
+    )
 
 
 @router.get("/models", response_model=ModelsResponse)
 async def list_models():
-    models = await list_all_models()
-    vision_models = [
-        m
-        for m in models
-        if (
-            "vision" in m.lower()
-            or "llava" in m.lower()
-            or "minicpm" in m.lower()
-            or "bakllava" in m.lower()
-            or "gemma3" in m.lower()
-            or "gemma2" in m.lower()
-            or ("qwen2.5" in m.lower() and "instruct" in m.lower())
-        )
-    ]
-    return ModelsResponse(vision_models=vision_models, all_models=models)
+    return ModelsResponse(vision_models=list_vision_models(), all_models=list_all_models())
 
 
 @router.get("/test-analysis", response_model=MoodResponse)
@@ -13,12 +13,24 @@ class MoodResponse(BaseModel):
     needs_hydration: bool
 
 
+class ModelQueueStats(BaseModel):
+    active: int
+    waiting: int
+    max_concurrency: int
+    max_queue: int
+    completed: int
+    rejected: int
+    coalesced: int
+    avg_latency_s: float
+
+
 class HealthResponse(BaseModel):
     status: str
     ollama_connected: bool
     available_models: list[str] | None = None
     default_model: str
     error: str | None = None
+    model_queues: dict[str, ModelQueueStats] | None = None
 
 
 class ModelsResponse(BaseModel):
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class ModelAdmission:
+    """Concurrency gate for one model: at most max_concurrency running, max_queue waiting."""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.coalesced = 0
+        # Exponential moving average of call latency, used for Retry-After
+        self.avg_latency_s = 0.0
+
+    def retry_after_s(self) -> int:
+        backlog = self.active + self.waiting + 1
+        return max(1, math.ceil(self.avg_latency_s * backlog / self.max_concurrency))
+
+    def reject_if_full(self) -> None:
+        """Raise 429 (with Retry-After) when every slot is busy and the queue is full."""
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            self.rejected += 1
+            retry_after = self.retry_after_s()
+            raise HTTPException(
+                status_code=429,
+                detail="Model is busy, retry later.",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the model's concurrency slots (429 if the queue is full)."""
+        self.reject_if_full()
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.avg_latency_s = elapsed if not self.completed else 0.8 * self.avg_latency_s + 0.2 * elapsed
+            self.completed += 1
+            self.active -= 1
+            self._semaphore.release()
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        async with self.slot():
+            return await call()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "coalesced": self.coalesced,
+            "avg_latency_s": round(self.avg_latency_s, 3),
+        }
+
+
+class AdmissionController:
+    """Per-model admission control plus coalescing of identical in-flight requests."""
+
+    def __init__(self, default_concurrency: int, max_queue: int, overrides: dict[str, int] | None = None):
+        self.default_concurrency = default_concurrency
+        self.max_queue = max_queue
+        self.overrides = overrides or {}
+        self._models: dict[str, ModelAdmission] = {}
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+
+    def for_model(self, model: str) -> ModelAdmission:
+        admission = self._models.get(model)
+        if admission is None:
+            admission = ModelAdmission(self.overrides.get(model, self.default_concurrency), self.max_queue)
+            self._models[model] = admission
+        return admission
+
+    async def run(self, model: str, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Run call() under the model's gate; concurrent calls with the same key share one result."""
+        admission = self.for_model(model)
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            admission.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(admission.run(call))
+        self._in_flight[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            self._in_flight.pop(key, None)
+            if not t.cancelled():
+                # Mark the exception as retrieved even if every waiter went away
+                t.exception()
+
+        task.add_done_callback(_done)
+        # Shield so a disconnecting client does not cancel the work other callers await
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {model: admission.stats() for model, admission in self._models.items()}
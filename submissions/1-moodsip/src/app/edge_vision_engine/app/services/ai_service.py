@@ -1,14 +1,20 @@
-import base64
-import io
+import asyncio
+import hashlib
 import json
 import logging
+import re
+import time
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 
-from PIL import Image
 from fastapi import HTTPException
 
 from app.config import settings
+from app.schemas import MoodResponse
+from app.services.admission import AdmissionController
+from app.services.image_service import PreparedImage, perceptual_hash
+from app.services.json_stream import IncrementalJSONObject
+from app.services.result_cache import ResultCache
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +26,121 @@ except Exception as e:  # pragma: no cover - optional at import time
     logger.warning(f"Ollama client not available: {e}")
 
 
-_model_names_cache: list[str] | None = None
+# Substrings identifying vision-capable model families
+VISION_MODEL_MARKERS = ("vision", "llava", "minicpm", "bakllava", "gemma3", "gemma2")
+
+
+def is_vision_model(name: str) -> bool:
+    lowered = name.lower()
+    return any(marker in lowered for marker in VISION_MODEL_MARKERS) or (
+        "qwen2.5" in lowered and "instruct" in lowered
+    )
+
+
+class ModelRegistry:
+    """In-memory view of the Ollama model list, refreshed in the background.
+
+    /health and /models read from here, so probes never hit Ollama directly.
+    """
+
+    def __init__(self, client, refresh_interval_s: float):
+        self.client = client
+        self.refresh_interval_s = refresh_interval_s
+        self.models: list[str] = []
+        self.vision_models: list[str] = []
+        self.connected = False
+        self.last_error: str | None = None
+        self.last_refresh: float | None = None
+        self._task: asyncio.Task | None = None
+        # Connection state last logged, so only transitions are logged (None = nothing logged yet)
+        self._logged_connected: bool | None = None
+
+    def _set_connected(self, connected: bool, error: str | None = None) -> None:
+        self.connected = connected
+        self.last_error = error
+        if connected == self._logged_connected:
+            return
+        if connected:
+            logger.info("Ollama reachable (%d models)", len(self.models))
+        else:
+            logger.error("Cannot connect to Ollama: %s", error)
+        self._logged_connected = connected
+
+    async def refresh(self) -> None:
+        if self.client is None:
+            self._set_connected(False, "Ollama client not available")
+            return
+        try:
+            models_response = await self.client.list()
+        except Exception as e:
+            # Keep serving the last known list
+            self._set_connected(False, str(e))
+            return
+
+        self.models = [m.model for m in models_response.models]
+        self.vision_models = [m for m in self.models if is_vision_model(m)]
+        self.last_refresh = time.time()
+        self._set_connected(True)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval_s)
+            await self.refresh()
+
+    def start(self) -> None:
+        if self._task is None and self.refresh_interval_s > 0:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+MODEL_REGISTRY = ModelRegistry(OLLAMA_CLIENT, settings.model_refresh_interval_s)
+
+# Bump whenever the analysis prompt changes so cached results are not reused
+PROMPT_VERSION = "1"
+
+RESULT_CACHE: ResultCache[MoodResponse] = ResultCache(
+    maxsize=settings.result_cache_size,
+    ttl_s=settings.result_cache_ttl_s,
+    max_distance=settings.result_cache_max_distance,
+)
+
+ADMISSION = AdmissionController(
+    default_concurrency=settings.model_max_concurrency,
+    max_queue=settings.model_max_queue,
+    overrides=settings.model_concurrency_overrides,
+)
+
+# Long-lived Google GenAI client (created on first Gemini request) and its concurrency gate
+_genai_client = None
+_gemini_semaphore: asyncio.Semaphore | None = None
+
+
+def _get_genai_client():
+    global _genai_client
+    if _genai_client is None:
+        from google import genai  # type: ignore
+
+        http_options = None
+        if settings.gemini_base_url:
+            # e.g. a local stub server for benchmarks
+            http_options = genai.types.HttpOptions(base_url=settings.gemini_base_url)
+        _genai_client = genai.Client(api_key=settings.google_api_key, http_options=http_options)
+    return _genai_client
+
+
+def _get_gemini_semaphore() -> asyncio.Semaphore:
+    global _gemini_semaphore
+    if _gemini_semaphore is None:
+        _gemini_semaphore = asyncio.Semaphore(max(1, settings.gemini_max_concurrency))
+    return _gemini_semaphore
 
 
 @asynccontextmanager
@@ -30,41 +150,37 @@ async def lifespan_context(app):
     logger.info("=" * 60)
     logger.info(f"🤖 Default Model: {settings.default_model}")
     logger.info("🚀 Server starting up...")
-    global _model_names_cache
-    try:
-        if OLLAMA_CLIENT is not None:
-            models_response = await OLLAMA_CLIENT.list()
-            _model_names_cache = [m.model for m in models_response.models]
-            logger.info("✅ Connected to Ollama")
-            if settings.default_model not in (_model_names_cache or []):
-                logger.warning(
-                    f"⚠️ Default model '{settings.default_model}' not found in Ollama"
-                )
-        else:
-            logger.warning("⚠️ Ollama client not initialized.")
-    except Exception as e:
+    await MODEL_REGISTRY.refresh()
+    if MODEL_REGISTRY.connected:
+        logger.info("✅ Connected to Ollama")
+        if settings.default_model not in MODEL_REGISTRY.models:
+            logger.warning(
+                f"⚠️ Default model '{settings.default_model}' not found in Ollama"
+            )
+    elif OLLAMA_CLIENT is None:
+        logger.warning("⚠️ Ollama client not initialized.")
+    else:
         logger.error("❌ Cannot connect to Ollama! Ensure the Ollama server is running.")
-        logger.error(f"   Error: {e}")
+        logger.error(f"   Error: {MODEL_REGISTRY.last_error}")
+    MODEL_REGISTRY.start()
     yield
+    await MODEL_REGISTRY.stop()
     logger.info("=" * 60)
     logger.info("🌙 Server shutting down.")
     logger.info("=" * 60)
 
 
-async def list_all_models() -> list[str]:
-    global _model_names_cache
-    if OLLAMA_CLIENT is None:
-        return _model_names_cache or []
-    try:
-        models_response = await OLLAMA_CLIENT.list()
-        return [m.model for m in models_response.models]
-    except Exception:
-        return _model_names_cache or []
+def list_all_models() -> list[str]:
+    """Last known Ollama model names (served from memory)."""
+    return MODEL_REGISTRY.models
 
 
-async def analyze_mood_with_ai(image_base64: str, model: str):
-    """Core analysis logic that can use Ollama or Google GenAI depending on model."""
-    system_prompt = """
+def list_vision_models() -> list[str]:
+    """Last known vision-capable Ollama model names (served from memory)."""
+    return MODEL_REGISTRY.vision_models
+
+
+SYSTEM_PROMPT = """
 You are a specialized AI assistant for facial expression analysis, focusing on detecting visible signs that may indicate dehydration or fatigue. Your role is to provide objective observations based on facial features visible in the image.
 
 ANALYSIS CRITERIA:
@@ -109,63 +225,80 @@ RULES:
 IMPORTANT: This is an assistive tool, not medical advice. Recommendations should be framed as general wellness suggestions.
 """
 
-    user_prompt = (
-        "Analyze this person's facial expression for signs of dehydration, tiredness, or sadness. Respond with JSON only."
-    )
+USER_PROMPT = (
+    "Analyze this person's facial expression for signs of dehydration, tiredness, or sadness. Respond with JSON only."
+)
 
-    try:
-        image_bytes = base64.b64decode(image_base64)
 
-        # If using a Google Gemini model
-        if model.startswith("gemini"):
-            if not settings.google_api_key:
-                raise HTTPException(
-                    status_code=503,
-                    detail="Google GenAI not available. Set GOOGLE_API_KEY in env.",
-                )
-            try:
-                # Lazy import to keep dependency optional
-                from google import genai  # type: ignore
-                from google.genai import types  # type: ignore
-            except Exception as e:
-                raise HTTPException(status_code=503, detail=f"Google GenAI import failed: {e}")
+async def generate_analysis_text(image: PreparedImage, model: str) -> str:
+    """Run the vision model (Ollama or Google GenAI depending on model) and return its raw text."""
+    image_bytes = image.data
+
+    # If using a Google Gemini model
+    if model.startswith("gemini"):
+        if not settings.google_api_key:
+            raise HTTPException(
+                status_code=503,
+                detail="Google GenAI not available. Set GOOGLE_API_KEY in env.",
+            )
+        try:
+            # Lazy import to keep dependency optional
+            from google.genai import types  # type: ignore
 
-            client = genai.Client(api_key=settings.google_api_key)
-            json_prompt = f"""{system_prompt}
+            client = _get_genai_client()
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Google GenAI import failed: {e}")
 
-{user_prompt}
+        json_prompt = f"""{SYSTEM_PROMPT}
+
+{USER_PROMPT}
 
 IMPORTANT: You must respond with ONLY valid JSON. No explanations, no markdown, no additional text. Just the JSON object."""
 
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=[
-                    types.Part.from_text(text=json_prompt),
-                    types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-                ],
+        # Async API so the event loop keeps serving other requests during the remote call
+        try:
+            async with _get_gemini_semaphore():
+                response = await asyncio.wait_for(
+                    client.aio.models.generate_content(
+                        model="gemini-2.0-flash-exp",
+                        contents=[
+                            types.Part.from_text(text=json_prompt),
+                            types.Part.from_bytes(data=image_bytes, mime_type=image.mime_type),
+                        ],
+                    ),
+                    timeout=settings.gemini_timeout_s,
+                )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Gemini did not respond within {settings.gemini_timeout_s:g}s",
             )
 
-            response_content: str = response.text or "{}"
-            if not response_content.strip().startswith("{"):
-                # Try to salvage JSON from the response
-                import re
+        return response.text or "{}"
 
-                m = re.search(r"\{.*\}", response_content, re.DOTALL)
-                response_content = m.group() if m else '{"needs_hydration": true, "detected_signs": ["Unable to analyze"], "confidence": 0.5, "recommendation": "Please try again"}'
+    if OLLAMA_CLIENT is None:
+        raise HTTPException(status_code=503, detail="Ollama client not available")
+    response = await OLLAMA_CLIENT.chat(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": USER_PROMPT, "images": [image_bytes]},
+        ],
+        format="json",
+        options={"temperature": 0.2},
+    )
+    return response["message"]["content"]
 
-        else:
-            if OLLAMA_CLIENT is None:
-                raise HTTPException(status_code=503, detail="Ollama client not available")
-            response = await OLLAMA_CLIENT.chat(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt, "images": [image_bytes]},
-                ],
-                format="json",
-                options={"temperature": 0.2},
-            )
-            response_content = response["message"]["content"]
+
+async def analyze_mood_with_ai(image: PreparedImage, model: str):
+    """Core analysis logic that can use Ollama or Google GenAI depending on model."""
+    try:
+        response_content = await generate_analysis_text(image, model)
+
+        if model.startswith("gemini") and not response_content.strip().startswith("{"):
+            # Try to salvage JSON from the response
+            m = re.search(r"\{.*\}", response_content, re.DOTALL)
+            response_content = m.group() if m else '{"needs_hydration": true, "detected_signs": ["Unable to analyze"], "confidence": 0.5, "recommendation": "Please try again"}'
 
         # Common JSON parse
         data = json.loads(response_content)
@@ -178,14 +311,109 @@ IMPORTANT: You must respond with ONLY valid JSON. No explanations, no markdown,
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def validate_image_base64(image_b64_or_data_url: str) -> tuple[bytes, tuple[int, int], str]:
-    """Validate base64 image (data URL or pure base64). Returns (raw_bytes, size, format)."""
-    img_b64 = image_b64_or_data_url
-    if img_b64.startswith("data:image"):
-        img_b64 = img_b64.split(",", 1)[1]
-    img_data = base64.b64decode(img_b64)
-    img = Image.open(io.BytesIO(img_data))
-    img.verify()
-    # Reopen to read size/format (verify() leaves file closed)
-    img2 = Image.open(io.BytesIO(img_data))
-    return img_data, img2.size, img2.format or ""
+async def _analyze_admitted(image: PreparedImage, model: str) -> MoodResponse:
+    # Per-model admission control; identical images in flight share a single model call
+    key = (model, PROMPT_VERSION, hashlib.blake2b(image.data, digest_size=16).digest())
+
+    async def call() -> MoodResponse:
+        return MoodResponse(**await analyze_mood_with_ai(image, model))
+
+    return await ADMISSION.run(model, key, call)
+
+
+async def analyze_mood_cached(image: PreparedImage, model: str) -> MoodResponse:
+    """Analyze an image, reusing the previous result for near-identical recent frames."""
+    if settings.result_cache_size <= 0:
+        return await _analyze_admitted(image, model)
+
+    image_hash = await asyncio.to_thread(perceptual_hash, image.data)
+    cached = RESULT_CACHE.get(image_hash, model, PROMPT_VERSION)
+    if cached is not None:
+        logger.debug("Result cache hit for %016x (%s)", image_hash, model)
+        return cached
+
+    # Validated before caching so malformed model output is never replayed
+    result = await _analyze_admitted(image, model)
+    RESULT_CACHE.put(image_hash, model, PROMPT_VERSION, result)
+    return result
+
+
+def admission_stats() -> dict[str, dict]:
+    """Queue metrics per model, for /health."""
+    return ADMISSION.stats()
+
+
+async def check_stream_admission(image: PreparedImage, model: str) -> int | None:
+    """Run before a stream starts, so overload is answered with a real 429 + Retry-After.
+
+    Returns the image's perceptual hash (None when the result cache is disabled) for
+    stream_mood_analysis; cache hits are never rejected since they do not need a slot.
+    """
+    image_hash = None
+    if settings.result_cache_size > 0:
+        image_hash = await asyncio.to_thread(perceptual_hash, image.data)
+        if RESULT_CACHE.get(image_hash, model, PROMPT_VERSION) is not None:
+            return image_hash
+    ADMISSION.for_model(model).reject_if_full()
+    return image_hash
+
+
+async def stream_mood_analysis(
+    image: PreparedImage, model: str, image_hash: int | None = None
+) -> AsyncIterator[tuple[str, Any]]:
+    """Analyze an image, yielding ("field", {key, value}) events as the model writes them.
+
+    Ends with ("result", MoodResponse) or ("error", {status, detail[, retry_after]}). Ollama
+    models stream token by token; Gemini and cache hits emit all fields at once from the
+    final result. image_hash is the value returned by check_stream_admission, if called.
+    """
+    try:
+        if settings.result_cache_size > 0:
+            if image_hash is None:
+                image_hash = await asyncio.to_thread(perceptual_hash, image.data)
+            cached = RESULT_CACHE.get(image_hash, model, PROMPT_VERSION)
+            if cached is not None:
+                for key, value in cached.model_dump().items():
+                    yield "field", {"key": key, "value": value}
+                yield "result", cached
+                return
+
+        if model.startswith("gemini"):
+            result = await _analyze_admitted(image, model)
+            for key, value in result.model_dump().items():
+                yield "field", {"key": key, "value": value}
+        else:
+            if OLLAMA_CLIENT is None:
+                raise HTTPException(status_code=503, detail="Ollama client not available")
+
+            parser = IncrementalJSONObject()
+            async with ADMISSION.for_model(model).slot():
+                stream = await OLLAMA_CLIENT.chat(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": USER_PROMPT, "images": [image.data]},
+                    ],
+                    format="json",
+                    options={"temperature": 0.2},
+                    stream=True,
+                )
+                async for part in stream:
+                    for key, value in parser.feed(part["message"]["content"]):
+                        yield "field", {"key": key, "value": value}
+            result = MoodResponse(**parser.result())
+
+        if image_hash is not None:
+            RESULT_CACHE.put(image_hash, model, PROMPT_VERSION, result)
+        yield "result", result
+
+    except HTTPException as e:
+        error = {"status": e.status_code, "detail": e.detail}
+        # The response has already started, so Retry-After can only travel in the payload
+        retry_after = (e.headers or {}).get("Retry-After")
+        if retry_after is not None:
+            error["retry_after"] = int(retry_after)
+        yield "error", error
+    except Exception as e:
+        logger.exception("Streaming analysis failed")
+        yield "error", {"status": 500, "detail": str(e)}
@@ -0,0 +1,119 @@
+import asyncio
+import io
+import logging
+
+from PIL import Image
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.image_service import PreparedImage
+
+logger = logging.getLogger(__name__)
+
+# Smallest face crop (pixels per side) worth sending to the vision model
+MIN_FACE_CROP_PX = 16
+
+try:
+    import numpy as np
+    import onnxruntime as ort
+except Exception as e:  # pragma: no cover - optional dependency
+    np = None
+    ort = None
+    logger.debug(f"onnxruntime not available, face pre-filter disabled: {e}")
+
+
+class FaceDetector:
+    """CPU face detector for UltraFace-style ONNX models (e.g. version-RFB-320.onnx).
+
+    The model takes a 1x3xHxW RGB tensor normalized as (x - 127) / 128 and returns
+    scores (1, N, 2) and boxes (1, N, 4) as normalized corner coordinates.
+    """
+
+    def __init__(self, model_path: str, min_score: float, margin: float):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = settings.face_detector_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        _, _, self.input_height, self.input_width = self.session.get_inputs()[0].shape
+        self.min_score = min_score
+        self.margin = margin
+
+    def detect(self, img: Image.Image) -> tuple[float, tuple[float, float, float, float]] | None:
+        """Return (score, normalized box) of the most confident face, or None."""
+        resized = img.resize((self.input_width, self.input_height), Image.Resampling.BILINEAR)
+        tensor = (np.asarray(resized, dtype=np.float32) - 127.0) / 128.0
+        tensor = tensor.transpose(2, 0, 1)[np.newaxis]
+
+        scores, boxes = self.session.run(None, {self.input_name: tensor})
+        face_scores = scores[0, :, 1]
+        best = int(face_scores.argmax())
+        if face_scores[best] < self.min_score:
+            return None
+        return float(face_scores[best]), tuple(float(v) for v in boxes[0, best])
+
+    def crop_to_face(self, image: PreparedImage) -> PreparedImage | None:
+        """Crop the image to the best face (plus margin), or None if no usable face is found.
+
+        Degenerate or out-of-frame detector boxes (empty or tiny after clamping) count as no face.
+        """
+        with Image.open(io.BytesIO(image.data)) as img:
+            img = img.convert("RGB")
+            detection = self.detect(img)
+            if detection is None:
+                return None
+
+            _, (x1, y1, x2, y2) = detection
+            width, height = img.size
+            pad_x = (x2 - x1) * self.margin
+            pad_y = (y2 - y1) * self.margin
+            box = (
+                max(0, int((x1 - pad_x) * width)),
+                max(0, int((y1 - pad_y) * height)),
+                min(width, int((x2 + pad_x) * width)),
+                min(height, int((y2 + pad_y) * height)),
+            )
+            if box[2] - box[0] < MIN_FACE_CROP_PX or box[3] - box[1] < MIN_FACE_CROP_PX:
+                logger.debug("Ignoring degenerate face box %s for a %dx%d image", box, width, height)
+                return None
+            face = img.crop(box)
+
+        out = io.BytesIO()
+        face.save(out, format="JPEG", quality=settings.image_jpeg_quality)
+        return PreparedImage(data=out.getvalue(), size=face.size, format="JPEG", original_size=image.original_size)
+
+
+_detector: FaceDetector | None = None
+_detector_failed = False
+
+
+def get_face_detector() -> FaceDetector | None:
+    """Lazily load the configured detector; None when the pre-filter is disabled or unavailable."""
+    global _detector, _detector_failed
+    if _detector is not None or _detector_failed or not settings.face_detector_model:
+        return _detector
+    if ort is None:
+        logger.warning("FACE_DETECTOR_MODEL is set but onnxruntime is not installed; pre-filter disabled")
+        _detector_failed = True
+        return None
+    try:
+        _detector = FaceDetector(
+            settings.face_detector_model,
+            min_score=settings.face_min_score,
+            margin=settings.face_crop_margin,
+        )
+        logger.info(f"🙂 Face pre-filter enabled ({settings.face_detector_model})")
+    except Exception as e:
+        logger.error(f"Cannot load face detector {settings.face_detector_model}: {e}")
+        _detector_failed = True
+    return _detector
+
+
+async def apply_face_filter(image: PreparedImage) -> PreparedImage:
+    """Reject frames without a face (422) and crop to the face before the LLM call."""
+    detector = get_face_detector()
+    if detector is None:
+        return image
+    cropped = await asyncio.to_thread(detector.crop_to_face, image)
+    if cropped is None:
+        raise HTTPException(status_code=422, detail="No face detected in image.")
+    return cropped
@@ -0,0 +1,108 @@
+import asyncio
+import base64
+import binascii
+import io
+import logging
+from dataclasses import dataclass
+
+from PIL import Image
+from fastapi import HTTPException
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP"}
+
+
+@dataclass
+class PreparedImage:
+    """Image bytes ready to hand to a vision model, decoded from the request exactly once."""
+
+    data: bytes
+    size: tuple[int, int]
+    format: str
+    original_size: tuple[int, int]
+
+    @property
+    def mime_type(self) -> str:
+        return f"image/{self.format.lower()}"
+
+
+def decode_base64_image(image_b64_or_data_url: str) -> bytes:
+    """Decode a data URL or pure base64 string to raw bytes."""
+    img_b64 = image_b64_or_data_url
+    if img_b64.startswith("data:image"):
+        img_b64 = img_b64.split(",", 1)[1]
+    try:
+        return base64.b64decode(img_b64, validate=True)
+    except (binascii.Error, ValueError):
+        pass
+    # Strict decoding rejects whitespace, but line-wrapped (MIME-style) base64 is valid input
+    try:
+        return base64.b64decode("".join(img_b64.split()), validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid base64 image: {e}")
+
+
+def _prepare_image_bytes(img_data: bytes, max_side: int) -> PreparedImage:
+    # Image.open only parses the header; pixels are decoded only if we need to resize
+    try:
+        img = Image.open(io.BytesIO(img_data))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
+    fmt = img.format or ""
+    if fmt not in ALLOWED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format: {fmt or 'unknown'}")
+
+    original_size = img.size
+    if not max_side or max(original_size) <= max_side:
+        return PreparedImage(data=img_data, size=original_size, format=fmt, original_size=original_size)
+
+    try:
+        # JPEG draft mode lets libjpeg downscale by 2/4/8 while decoding
+        img.draft("RGB", (max_side, max_side))
+        img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=settings.image_jpeg_quality)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
+    logger.debug("Downsized image %s -> %s", original_size, img.size)
+    return PreparedImage(data=out.getvalue(), size=img.size, format="JPEG", original_size=original_size)
+
+
+async def prepare_image_bytes(img_data: bytes, max_side: int | None = None) -> PreparedImage:
+    """Validate raw image bytes and downsize them to the resolution the vision model needs."""
+    if max_side is None:
+        max_side = settings.max_image_side
+    # Decoding/resizing is CPU-bound: keep it off the event loop
+    return await asyncio.to_thread(_prepare_image_bytes, img_data, max_side)
+
+
+async def prepare_image(image_b64_or_data_url: str, max_side: int | None = None) -> PreparedImage:
+    """Decode a base64 image once, validate it and downsize it for the vision model."""
+    return await prepare_image_bytes(decode_base64_image(image_b64_or_data_url), max_side)
+
+
+async def validate_image_base64(image_b64_or_data_url: str) -> tuple[bytes, tuple[int, int], str]:
+    """Validate base64 image (data URL or pure base64). Returns (raw_bytes, size, format)."""
+    prepared = await prepare_image(image_b64_or_data_url, max_side=0)
+    return prepared.data, prepared.size, prepared.format
+
+
+def perceptual_hash(img_data: bytes, hash_size: int = 8) -> int:
+    """64-bit difference hash (dHash): near-identical frames map to nearby hashes."""
+    with Image.open(io.BytesIO(img_data)) as img:
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
@@ -0,0 +1,76 @@
+import json
+from typing import Any
+
+
+class IncrementalJSONObject:
+    """Incrementally parses a streamed JSON object, yielding each top-level field once complete.
+
+    feed() accepts arbitrary text chunks (e.g. LLM tokens) and returns the (key, value)
+    pairs whose values finished in that chunk. Nested arrays/objects are returned whole.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.fields: dict[str, Any] = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._field_start: int | None = None
+        self.done = False
+
+    def feed(self, text: str) -> list[tuple[str, Any]]:
+        self.buffer += text
+        completed: list[tuple[str, Any]] = []
+
+        while self._pos < len(self.buffer) and not self.done:
+            ch = self.buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._field_start = self._pos + 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    self._complete_field(self._pos, completed)
+                    self.done = True
+                self._depth -= 1
+            elif ch == "," and self._depth == 1:
+                self._complete_field(self._pos, completed)
+                self._field_start = self._pos + 1
+            self._pos += 1
+
+        return completed
+
+    def _complete_field(self, end: int, completed: list[tuple[str, Any]]) -> None:
+        if self._field_start is None:
+            return
+        segment = self.buffer[self._field_start:end].strip()
+        if not segment:
+            return
+        try:
+            parsed = json.loads("{" + segment + "}")
+        except json.JSONDecodeError:
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
+
+    def result(self) -> dict[str, Any]:
+        """Parse the whole buffer (falls back to the fields seen so far)."""
+        start = self.buffer.find("{")
+        end = self.buffer.rfind("}")
+        if start != -1 and end > start:
+            try:
+                return json.loads(self.buffer[start:end + 1])
+            except json.JSONDecodeError:
+                pass
+        return dict(self.fields)
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class ResultCache(Generic[T]):
+    """TTL + LRU cache of analysis results keyed by (perceptual hash, model, prompt version).
+
+    Lookups first try the exact hash, then (if max_distance > 0) the nearest unexpired entry
+    for the same model/prompt whose hash is within max_distance bits, so near-identical
+    frames hit too.
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float, max_distance: int = 0):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.max_distance = max_distance
+        self._entries: OrderedDict[tuple[int, str, str], tuple[float, T]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_hash: int, model: str, prompt_version: str) -> T | None:
+        now = time.monotonic()
+        key = (image_hash, model, prompt_version)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < now:
+            del self._entries[key]
+            entry = None
+
+        if entry is None and self.max_distance > 0:
+            # Nearest valid entry within max_distance; expired ones are dropped on the way
+            expired = []
+            best_distance = self.max_distance + 1
+            for other_key, other_entry in self._entries.items():
+                if other_key[1:] != key[1:]:
+                    continue
+                if other_entry[0] < now:
+                    expired.append(other_key)
+                    continue
+                distance = (other_key[0] ^ image_hash).bit_count()
+                if distance < best_distance:
+                    key, entry, best_distance = other_key, other_entry, distance
+                    if distance == 1:  # the exact hash already missed, nothing can be closer
+                        break
+            for expired_key in expired:
+                del self._entries[expired_key]
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, image_hash: int, model: str, prompt_version: str, value: T) -> None:
+        key = (image_hash, model, prompt_version)
+        self._entries[key] = (time.monotonic() + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,121 @@
+# bench_upload.py
+
+"""Compare request throughput of the JSON/base64 and binary /analyze-mood endpoints.
+
+The same image is sent repeatedly, so after the first call every request is a
+result-cache hit and the numbers measure transport, parsing and decoding overhead
+rather than the vision model.
+
+Usage:
+  python bench_upload.py photo.jpg --url http://localhost:8001 --requests 200 --concurrency 8
+"""
+
+import argparse
+import base64
+import json
+import mimetypes
+import ssl
+import statistics
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _json_request(url: str, image: bytes, model: str) -> urllib.request.Request:
+    body = json.dumps({"image": base64.b64encode(image).decode("ascii"), "model": model}).encode()
+    return urllib.request.Request(
+        f"{url}/analyze-mood", data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+
+
+def _raw_request(url: str, image: bytes, model: str, mime_type: str) -> urllib.request.Request:
+    return urllib.request.Request(
+        f"{url}/analyze-mood/binary?model={urllib.parse.quote(model)}",
+        data=image,
+        headers={"Content-Type": mime_type},
+        method="POST",
+    )
+
+
+def _multipart_request(url: str, image: bytes, model: str, mime_type: str) -> urllib.request.Request:
+    boundary = uuid.uuid4().hex
+    body = b"".join(
+        [
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="model"\r\n\r\n',
+            model.encode(),
+            f"\r\n--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="image"; filename="frame"\r\n',
+            f"Content-Type: {mime_type}\r\n\r\n".encode(),
+            image,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+    )
+    return urllib.request.Request(
+        f"{url}/analyze-mood/binary",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        method="POST",
+    )
+
+
+def run(make_request, n_requests: int, concurrency: int, context: ssl.SSLContext | None) -> dict:
+    def one(_):
+        req = make_request()
+        start = time.perf_counter()
+        with urllib.request.urlopen(req, context=context) as resp:
+            resp.read()
+        return time.perf_counter() - start, len(req.data)
+
+    # Warm-up fills the result cache
+    one(0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r[0] for r in results)
+    return {
+        "req_per_s": n_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "request_bytes": results[0][1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image", help="Image file to send")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--model", default="gemma3:12b")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed certs)")
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image = f.read()
+    mime_type = mimetypes.guess_type(args.image)[0] or "image/jpeg"
+    url = args.url.rstrip("/")
+    context = ssl._create_unverified_context() if args.insecure else None
+
+    variants = {
+        "json/base64": lambda: _json_request(url, image, args.model),
+        "raw body": lambda: _raw_request(url, image, args.model, mime_type),
+        "multipart": lambda: _multipart_request(url, image, args.model, mime_type),
+    }
+
+    print(f"{'variant':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>10}")
+    for name, make_request in variants.items():
+        stats = run(make_request, args.requests, args.concurrency, context)
+        print(
+            f"{name:<12} {stats['req_per_s']:>8.1f} {stats['p50_ms']:>8.1f} "
+            f"{stats['p95_ms']:>8.1f} {stats['request_bytes']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# benchmark.py
+
+"""Replay a folder of frames against each vision model and write a comparison report.
+
+For every model the frames are sent sequentially (no queueing effects) and the script
+measures latency percentiles, JSON parse/validation failure rate and the agreement
+between models (needs_hydration, detected_signs overlap, confidence gap).
+
+--gemini-stub starts a local HTTP server that mimics the Gemini generateContent API
+with a canned answer and a configurable delay, so the Gemini code path can be
+benchmarked without network access or an API key.
+
+Usage:
+  python benchmark.py frames/                          # all vision models known to Ollama
+  python benchmark.py frames/ --models gemma3:12b llava:7b --gemini-stub --output report
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.schemas import MoodResponse
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+STUB_MODEL = "gemini-stub"
+STUB_ANSWER = {
+    "detected_signs": ["tiredness"],
+    "recommendation": "You look a little tired. Take a short break and drink some water.",
+    "confidence": 0.5,
+    "needs_hydration": False,
+}
+
+
+def start_gemini_stub(delay_s: float) -> ThreadingHTTPServer:
+    """Serve a minimal generateContent endpoint on 127.0.0.1 (random port)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(delay_s)
+            body = json.dumps(
+                {
+                    "candidates": [
+                        {
+                            "content": {"role": "model", "parts": [{"text": json.dumps(STUB_ANSWER)}]},
+                            "finishReason": "STOP",
+                        }
+                    ]
+                }
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_response(text: str) -> MoodResponse | None:
+    """Strict parse: the model must return a JSON object matching MoodResponse."""
+    try:
+        return MoodResponse(**json.loads(text))
+    except (json.JSONDecodeError, TypeError, ValidationError):
+        return None
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+async def bench_model(model: str, frames: list, repeats: int) -> list[dict]:
+    from app.services.ai_service import generate_analysis_text
+
+    records = []
+    for _ in range(repeats):
+        for name, image in frames:
+            start = time.perf_counter()
+            try:
+                text = await generate_analysis_text(image, model)
+                error = None
+            except Exception as e:
+                text, error = None, str(getattr(e, "detail", e))
+            latency_ms = (time.perf_counter() - start) * 1000
+            result = parse_response(text) if text is not None else None
+            records.append(
+                {
+                    "frame": name,
+                    "latency_ms": latency_ms,
+                    "error": error,
+                    "parse_failed": error is None and result is None,
+                    "result": result.model_dump() if result else None,
+                }
+            )
+        print(f"  {model}: {len(records)} calls", flush=True)
+    return records
+
+
+def summarize(records: list[dict]) -> dict:
+    ok = [r for r in records if r["error"] is None]
+    latencies = sorted(r["latency_ms"] for r in ok)
+    return {
+        "calls": len(records),
+        "errors": len(records) - len(ok),
+        "parse_failure_rate": (sum(r["parse_failed"] for r in ok) / len(ok)) if ok else float("nan"),
+        "p50_ms": percentile(latencies, 0.50),
+        "p90_ms": percentile(latencies, 0.90),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": statistics.fmean(latencies) if latencies else float("nan"),
+    }
+
+
+def agreement(records_a: list[dict], records_b: list[dict]) -> dict:
+    # Compare the first successful result per frame
+    def first_results(records):
+        out = {}
+        for r in records:
+            if r["result"] is not None:
+                out.setdefault(r["frame"], r["result"])
+        return out
+
+    a, b = first_results(records_a), first_results(records_b)
+    common = sorted(a.keys() & b.keys())
+    if not common:
+        return {"frames": 0, "hydration_agreement": float("nan"), "signs_jaccard": float("nan"),
+                "confidence_gap": float("nan")}
+
+    hydration, jaccard, gap = [], [], []
+    for frame in common:
+        ra, rb = a[frame], b[frame]
+        hydration.append(ra["needs_hydration"] == rb["needs_hydration"])
+        signs_a = {s.lower() for s in ra["detected_signs"]}
+        signs_b = {s.lower() for s in rb["detected_signs"]}
+        union = signs_a | signs_b
+        jaccard.append(len(signs_a & signs_b) / len(union) if union else 1.0)
+        gap.append(abs(ra["confidence"] - rb["confidence"]))
+
+    return {
+        "frames": len(common),
+        "hydration_agreement": statistics.fmean(hydration),
+        "signs_jaccard": statistics.fmean(jaccard),
+        "confidence_gap": statistics.fmean(gap),
+    }
+
+
+def render_markdown(summaries: dict, agreements: dict) -> str:
+    lines = [
+        "# MoodSip model benchmark",
+        "",
+        "| model | calls | errors | parse fail | p50 ms | p90 ms | p99 ms | mean ms |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for model, s in summaries.items():
+        lines.append(
+            f"| {model} | {s['calls']} | {s['errors']} | {s['parse_failure_rate']:.1%} | {s['p50_ms']:.0f} "
+            f"| {s['p90_ms']:.0f} | {s['p99_ms']:.0f} | {s['mean_ms']:.0f} |"
+        )
+    if agreements:
+        lines += [
+            "",
+            "| model A | model B | frames | needs_hydration agree | signs Jaccard | confidence gap |",
+            "|---|---|---|---|---|---|",
+        ]
+        for (model_a, model_b), g in agreements.items():
+            lines.append(
+                f"| {model_a} | {model_b} | {g['frames']} | {g['hydration_agreement']:.1%} "
+                f"| {g['signs_jaccard']:.2f} | {g['confidence_gap']:.2f} |"
+            )
+    return "\n".join(lines) + "\n"
+
+
+async def run(args) -> None:
+    from app.services.ai_service import MODEL_REGISTRY
+    from app.services.image_service import prepare_image_bytes
+
+    paths = sorted(p for p in Path(args.frames).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    if args.limit:
+        paths = paths[: args.limit]
+    if not paths:
+        raise SystemExit(f"No images found in {args.frames}")
+
+    # Decode/downsize once, exactly as the server does, and reuse for every model
+    frames = [(p.name, await prepare_image_bytes(p.read_bytes())) for p in paths]
+
+    models = list(args.models or [])
+    if not models:
+        await MODEL_REGISTRY.refresh()
+        models = list(MODEL_REGISTRY.vision_models)
+    if args.gemini_stub and STUB_MODEL not in models:
+        models.append(STUB_MODEL)
+    if not models:
+        raise SystemExit("No models to benchmark (is Ollama running?)")
+
+    print(f"Benchmarking {len(models)} models on {len(frames)} frames x {args.repeats}")
+    records = {}
+    for model in models:
+        records[model] = await bench_model(model, frames, args.repeats)
+
+    summaries = {model: summarize(r) for model, r in records.items()}
+    agreements = {
+        (a, b): agreement(records[a], records[b]) for a, b in itertools.combinations(models, 2)
+    }
+
+    report = render_markdown(summaries, agreements)
+    print()
+    print(report)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.with_suffix(".md").write_text(report)
+        output.with_suffix(".json").write_text(
+            json.dumps(
+                {
+                    "summaries": summaries,
+                    "agreements": [{"model_a": a, "model_b": b, **g} for (a, b), g in agreements.items()],
+                    "records": records,
+                },
+                indent=2,
+            )
+        )
+        print(f"Report written to {output.with_suffix('.md')} and {output.with_suffix('.json')}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("frames", help="Folder of frames to replay")
+    parser.add_argument("--models", nargs="*", help="Models to compare (default: all Ollama vision models)")
+    parser.add_argument("--repeats", type=int, default=1, help="Replays of the whole folder per model")
+    parser.add_argument("--limit", type=int, default=0, help="Use only the first N frames")
+    parser.add_argument("--gemini-stub", action="store_true", help=f"Also benchmark '{STUB_MODEL}' via a local stub")
+    parser.add_argument("--stub-delay", type=float, default=0.8, help="Stub response delay in seconds")
+    parser.add_argument("--output", help="Report path prefix (writes .md and .json)")
+    args = parser.parse_args()
+
+    stub = None
+    if args.gemini_stub:
+        stub = start_gemini_stub(args.stub_delay)
+        # Must be set before the first Gemini call creates the shared client
+        settings.gemini_base_url = f"http://127.0.0.1:{stub.server_address[1]}"
+        settings.google_api_key = settings.google_api_key or "stub"
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        if stub is not None:
+            stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
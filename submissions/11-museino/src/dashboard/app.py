@@ -1,5 +1,6 @@
 from __future__ import annotations
 import os
+import socket
 import sys
 import threading
 import gradio as gr
@@ -12,7 +13,8 @@ from core.udp import udp_listener
 from core.serial import serial_reader
 from ui.components import create_interface_layout
 from ui.update import snapshot_state
-from core.state import clear_all_data
+from core.state import clear_all_data, configure_time_series
+from core.recorder import start_recording
 
 CUSTOM_CSS = """
 .status-summary {
@@ -127,20 +129,36 @@ def main():
 
     # Clear all global data structures to avoid leftovers from previous runs
     clear_all_data()
-
-    # Start a background thread that continuously listens for UDP packets from the cameras
-    # The thread runs in parallel without blocking the user interface
-    threading.Thread(
-        target=udp_listener,
-        kwargs={
-            "udp_ip_address": configuration.udp_ip_address,
-            "udp_port_number": configuration.udp_port_number,
-            "safe_distance_mm": configuration.safe_distance_mm,
-            "hysteresis_mm": configuration.hysteresis_mm,
-            "min_dwell_seconds": configuration.min_dwell_seconds
-        },
-        daemon=True  # Thread closes automatically when the main program exits
-    ).start()
+    configure_time_series(configuration.max_data_points)
+
+    # Persist telemetry and events to rotating segment files (replay them with replay.py)
+    if configuration.record_sessions:
+        start_recording(configuration.export_directory, configuration.record_segment_mb * 1024 * 1024,
+                        max_segments=configuration.record_max_segments)
+
+    # Start background threads that continuously listen for UDP packets from the cameras
+    # The threads run in parallel without blocking the user interface
+    # Several workers share the port via SO_REUSEPORT; each camera always lands on the same worker
+    udp_workers = max(1, configuration.udp_workers)
+    if udp_workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        print("[UDP] SO_REUSEPORT is not available on this platform, using a single listener")
+        udp_workers = 1
+    for worker_index in range(udp_workers):
+        threading.Thread(
+            target=udp_listener,
+            kwargs={
+                "udp_ip_address": configuration.udp_ip_address,
+                "udp_port_number": configuration.udp_port_number,
+                "safe_distance_mm": configuration.safe_distance_mm,
+                "hysteresis_mm": configuration.hysteresis_mm,
+                "min_dwell_seconds": configuration.min_dwell_seconds,
+                "receive_buffer_bytes": configuration.udp_receive_buffer_bytes,
+                "max_batch": configuration.udp_max_batch,
+                "reuse_port": udp_workers > 1,
+                "worker_name": "UDP" if udp_workers == 1 else f"UDP-{worker_index}"
+            },
+            daemon=True  # Thread closes automatically when the main program exits
+        ).start()
 
     # Start a thread to read the Nicla-02 (FOMO) serial port
     threading.Thread(
@@ -161,16 +179,20 @@ def main():
         # This keeps data live without manual refreshes
         timer = gr.Timer(1.0, active=True)
         timer.tick(
-            fn=lambda selected_camera, safe_distance: snapshot_state(
+            fn=lambda selected_camera, safe_distance, render_state: snapshot_state(
                 selected_camera,
                 safe_distance,
                 configuration.window_seconds,
                 configuration.max_events_in_table,
-                configuration.nicla2_cam_id
+                configuration.nicla2_cam_id,
+                render_state,
+                plot_max_points=configuration.plot_max_points,
+                plot_downsample=configuration.plot_downsample
             ),
             inputs=[
                 interface_components["camera_selection_dropdown"],
-                interface_components["safe_distance_slider"]
+                interface_components["safe_distance_slider"],
+                interface_components["render_state"]
             ],
             outputs=[
                 interface_components["status_summary_markdown"],
@@ -179,7 +201,8 @@ def main():
                 interface_components["alarm_events_data_table"],
                 interface_components["last_packet_debug_json"],
                 interface_components["camera_selection_dropdown"],
-                interface_components["fomo_box"]
+                interface_components["fomo_box"],
+                interface_components["render_state"]
             ],
         )
 
@@ -2,19 +2,25 @@
 from __future__ import annotations
 import os
 import sys
+from typing import List, Tuple
+import numpy as np
 
 # Add the project path so we can import local modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-from core.state import alert_state_by_camera
+from core.state import get_camera_shard
 from core.events import push_event
 
+# Candidate transitions examined per NumPy pass while looking for the next one that passes the dwell check
+ALERT_SCAN_CHUNK = 256
+
 def process_alert(camera_id: str, distance_mm: float, timestamp: float, safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float):
     """
     Process the per-camera alarm logic based on the measured distance.
     Use hysteresis to avoid rapid oscillations between alert states.
     Record alarm enter/exit events in the log.
+    The caller must hold the camera's shard lock.
     """
-    alert_state = alert_state_by_camera[camera_id]
+    alert_state = get_camera_shard(camera_id).alert_state
     previous_alert_state = alert_state["in_alert"]
     # Compute hysteresis thresholds for stability
     lower_threshold, upper_threshold = safe_distance_mm - hysteresis_mm, safe_distance_mm + hysteresis_mm
@@ -46,3 +52,64 @@ def process_alert(camera_id: str, distance_mm: float, timestamp: float, safe_dis
         alert_state["in_alert"] = False
         dwell_time = timestamp - (alert_state["t_start"] or timestamp)
         push_event("ALERT_EXIT", camera_id, {"dwell_seconds": round(dwell_time, 2), "safe_distance_mm": safe_distance_mm})
+
+def process_alert_batch(camera_id: str, timestamps, distances, safe_distance_mm: int, hysteresis_mm: int,
+                        min_dwell_seconds: float) -> List[Tuple[int, str]]:
+    """
+    Vectorised process_alert for a batch of samples of one camera, in arrival order.
+    Produce exactly the state changes and ALERT_ENTER/EXIT events that calling
+    process_alert once per (timestamp, distance) pair would produce.
+    Return the (sample index, event type) of every transition.
+    The caller must hold the camera's shard lock.
+
+    The state only changes on a transition, so between two transitions every sample
+    is judged against the same state: the candidates are the samples beyond the
+    opposite threshold, and the next transition is the first candidate that passes
+    the dwell check. Thresholds are classified once with NumPy; Python only loops
+    over the transitions themselves.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    distances = np.asarray(distances, dtype=np.float64)
+    # Compute hysteresis thresholds for stability
+    lower_threshold, upper_threshold = safe_distance_mm - hysteresis_mm, safe_distance_mm + hysteresis_mm
+    # Sample indices that would switch the state on (below) or off (above)
+    enter_candidates = np.flatnonzero(distances < lower_threshold)
+    exit_candidates = np.flatnonzero(distances > upper_threshold)
+
+    alert_state = get_camera_shard(camera_id).alert_state
+    transitions = []
+    position = 0
+    while position < len(distances):
+        candidates = exit_candidates if alert_state["in_alert"] else enter_candidates
+        candidates = candidates[np.searchsorted(candidates, position):]
+        last_change = alert_state.get("last_change")
+        index = None
+        # Scan in chunks so a long debounced stretch is not re-read for every transition
+        for chunk_start in range(0, len(candidates), ALERT_SCAN_CHUNK):
+            chunk = candidates[chunk_start:chunk_start + ALERT_SCAN_CHUNK]
+            chunk_timestamps = timestamps[chunk]
+            # Same expression as process_alert, including "last_change or timestamp"
+            elapsed = chunk_timestamps - (last_change if last_change else chunk_timestamps)
+            passed = np.flatnonzero(elapsed >= min_dwell_seconds)
+            if len(passed):
+                index = int(chunk[passed[0]])
+                break
+        if index is None:
+            break
+
+        timestamp = float(timestamps[index])
+        alert_state["last_change"] = timestamp
+        if not alert_state["in_alert"]:
+            # Entering the alert state
+            alert_state["in_alert"] = True
+            alert_state["t_start"] = timestamp
+            push_event("ALERT_ENTER", camera_id, {"distance_mm": float(distances[index]), "safe_distance_mm": safe_distance_mm})
+            transitions.append((index, "ALERT_ENTER"))
+        else:
+            # Leaving the alert state
+            alert_state["in_alert"] = False
+            dwell_time = timestamp - (alert_state["t_start"] or timestamp)
+            push_event("ALERT_EXIT", camera_id, {"dwell_seconds": round(dwell_time, 2), "safe_distance_mm": safe_distance_mm})
+            transitions.append((index, "ALERT_EXIT"))
+        position = index + 1
+    return transitions
@@ -11,14 +11,22 @@ class Configuration:
     """
     udp_ip_address: str = "0.0.0.0"  # IP address used by the UDP listener
     udp_port_number: int = 5005  # UDP port used to receive data from the cameras
+    udp_receive_buffer_bytes: int = 4 * 1024 * 1024  # Kernel receive buffer for the UDP socket
+    udp_max_batch: int = 1024  # Maximum datagrams decoded and applied per batch
+    udp_workers: int = 1  # UDP listener threads sharing the port via SO_REUSEPORT
     safe_distance_mm: int = 400  # Safe distance in millimetres
     window_seconds: int = 300  # Time window for the charts (2 minutes)
+    plot_max_points: int = 1500  # Point budget for the distance chart (0 = draw every sample)
+    plot_downsample: str = "minmax"  # Downsampling method for the chart: minmax, lttb or none
     max_data_points: int = 20000  # Maximum number of data points per camera
-    max_events_in_table: int = 0  # Maximum events in the table (0 = unlimited)
+    max_events_in_table: int = 500  # Newest events shown in the table (only these rows are formatted)
     hysteresis_mm: int = 200  # Hysteresis used to avoid alarm oscillations
     min_dwell_seconds: float = 0.8  # Minimum dwell time before changing the alarm state
     is_demo_mode: bool = False  # Demo mode flag (currently unused)
     export_directory: str = "./exports"  # Directory used to export data
+    record_sessions: bool = False  # Persist telemetry and events under export_directory
+    record_segment_mb: int = 64  # Size of each session segment file before rotating
+    record_max_segments: int = 0  # Keep only the newest N segments per session (0 = keep all)
     # Serial config for Nicla-02 (FOMO)
     nicla2_port: str = "/dev/cu.usbmodem11301"  # Serial port used by Nicla-02
     nicla2_baud: int = 921600  # Baud rate for Nicla-02
@@ -32,14 +40,22 @@ def load_configuration() -> Configuration:
     configuration = Configuration(
         udp_ip_address=os.getenv("MUSEINO_UDP_IP", "0.0.0.0"),
         udp_port_number=int(os.getenv("MUSEINO_UDP_PORT", "5005")),
+        udp_receive_buffer_bytes=int(os.getenv("MUSEINO_UDP_RCVBUF", str(4 * 1024 * 1024))),
+        udp_max_batch=int(os.getenv("MUSEINO_UDP_MAX_BATCH", "1024")),
+        udp_workers=int(os.getenv("MUSEINO_UDP_WORKERS", "1")),
         safe_distance_mm=int(os.getenv("MUSEINO_SAFE_MM", "400")),
         window_seconds=int(os.getenv("MUSEINO_WINDOW_SEC", "300")),
+        plot_max_points=int(os.getenv("MUSEINO_PLOT_MAX_POINTS", "1500")),
+        plot_downsample=os.getenv("MUSEINO_PLOT_DOWNSAMPLE", "minmax").lower(),
         max_data_points=int(os.getenv("MUSEINO_MAX_POINTS", "20000")),
-        max_events_in_table=int(os.getenv("MUSEINO_MAX_EVENTS_IN_TABLE", "0") or "0"),
+        max_events_in_table=int(os.getenv("MUSEINO_MAX_EVENTS_IN_TABLE", "500") or "500"),
         hysteresis_mm=int(os.getenv("MUSEINO_HYST_MM", "200")),
         min_dwell_seconds=float(os.getenv("MUSEINO_MIN_DWELL", "0.8")),
         is_demo_mode=os.getenv("MUSEINO_DEMO", "0") == "1",
         export_directory=op.abspath(os.getenv("MUSEINO_EXPORT_DIR", "./exports")),
+        record_sessions=os.getenv("MUSEINO_RECORD", "0") == "1",
+        record_segment_mb=int(os.getenv("MUSEINO_RECORD_SEGMENT_MB", "64")),
+        record_max_segments=int(os.getenv("MUSEINO_RECORD_MAX_SEGMENTS", "0")),
         nicla2_port=os.getenv("NICLA2_PORT", "/dev/cu.usbmodem11301"),
         nicla2_baud=int(os.getenv("NICLA2_BAUD", "921600")),
         nicla2_cam_id=os.getenv("NICLA2_CAM_ID", "nicla-02")
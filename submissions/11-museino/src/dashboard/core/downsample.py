@@ -0,0 +1,59 @@
+from __future__ import annotations
+import numpy as np
+
+# Reducers that pick which samples of a long time series to draw within a fixed point budget.
+# Both return sorted indices into the input arrays and always keep the first and last sample.
+
+def minmax_indices(y: "np.ndarray", max_points: int) -> "np.ndarray":
+    """
+    Split the series into max_points // 2 equal buckets and keep the minimum and maximum of each.
+    Fully vectorised; preserves every spike (e.g. the closest approach that triggered an alert).
+    """
+    n = len(y)
+    if max_points <= 0 or n <= max_points or max_points < 4:
+        return np.arange(n)
+    n_buckets = max_points // 2
+    starts = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+    bucket_of = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+    positions = np.arange(n)
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    # First position of each bucket's min / max (positions that are not extremes map to n)
+    first_min = np.minimum.reduceat(np.where(y == mins[bucket_of], positions, n), starts)
+    first_max = np.minimum.reduceat(np.where(y == maxs[bucket_of], positions, n), starts)
+    indices = np.concatenate([first_min, first_max, [0, n - 1]])
+    return np.unique(indices[indices < n])
+
+def lttb_indices(x: "np.ndarray", y: "np.ndarray", max_points: int) -> "np.ndarray":
+    """
+    Largest-Triangle-Three-Buckets: keep the point of each bucket that forms the largest triangle
+    with the previously kept point and the average of the next bucket. Best visual shape per point.
+    """
+    n = len(x)
+    if max_points <= 0 or n <= max_points or max_points < 3:
+        return np.arange(n)
+    # max_points - 2 buckets between the fixed first and last samples
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    indices = np.empty(max_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(areas.argmax())
+        indices[bucket + 1] = previous
+    return indices
+
+def downsample_indices(x: "np.ndarray", y: "np.ndarray", max_points: int, method: str = "minmax") -> "np.ndarray":
+    """
+    Return the indices to plot using method 'minmax', 'lttb' or 'none'.
+    """
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    return np.arange(len(x))
@@ -3,40 +3,38 @@ from __future__ import annotations
 import os.path as op
 import os
 import sys
-from datetime import datetime
 import pandas as pd
 
 # Add the project path so we can import local modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-from core.state import get_current_timestamp, event_log, data_lock
+from core.state import get_current_timestamp, event_log
 
 def push_event(event_type: str, camera_id: str, payload: dict):
     """
     Append an event to the shared event log.
     Used to record events such as alarm entries and exits.
     The payload stores extra data like distance or dwell time.
+    The event store is lock-free, so no shard lock is needed.
     """
-    with data_lock:
-        event_log.append({
-            "time": datetime.fromtimestamp(get_current_timestamp()).isoformat(timespec="seconds"),
-            "cam_id": camera_id,
-            "event": event_type,
-            "value": pd.io.json.dumps(payload, ensure_ascii=False),
-        })
+    event_log.append(get_current_timestamp(), event_type, camera_id, payload)
 
+# Rows formatted for the events table when no positive limit is configured
+DEFAULT_EVENTS_TABLE_ROWS = 500
 
-
-def to_events_dataframe(event_list: list[dict] | None = None) -> "pd.DataFrame":
+def to_events_dataframe(event_list: list[dict] | None = None, limit: int = DEFAULT_EVENTS_TABLE_ROWS,
+                        page_index: int = 0) -> "pd.DataFrame":
     """
     Convert the event list into a pandas DataFrame for display.
-    If event_list is None, read from the current event log.
+    If event_list is None, read one page of limit events from the event log (page 0 holds
+    the newest); only those rows are formatted. A limit <= 0 falls back to
+    DEFAULT_EVENTS_TABLE_ROWS instead of formatting the whole log.
     """
-    import pandas as pd
     if event_list is None:
-        with data_lock:
-            event_list = list(event_log)
+        if limit <= 0:
+            limit = DEFAULT_EVENTS_TABLE_ROWS
+        event_list = event_log.page(page_index, limit)
     if not event_list:
-        return pd.DataFrame(columns=["time", "cam_id", "event", "value"])
-    return pd.DataFrame(event_list).copy()
+        return pd.DataFrame(columns=event_log.COLUMNS)
+    return pd.DataFrame(event_list, columns=event_log.COLUMNS)
 
 
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+
+# Session recording: telemetry and events are appended as JSON lines to rotating segment
+# files under <export_directory>/session-YYYYmmdd-HHMMSS/segment-00001.jsonl, ...
+# Writes happen on a background thread; record_*() only enqueue, so ingestion never waits on disk.
+RECORD_FORMAT_VERSION = 1
+
+class SessionRecorder:
+    """
+    Append-only recorder for one dashboard session with size-based segment rotation,
+    periodic flushing and optional retention of the newest max_segments files.
+    """
+
+    def __init__(self, export_directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 flush_seconds: float = 1.0, max_segments: int = 0):
+        self.session_directory = os.path.join(export_directory, f"session-{datetime.now():%Y%m%d-%H%M%S}")
+        self.segment_bytes = max(1024, int(segment_bytes))
+        self.flush_seconds = flush_seconds
+        self.max_segments = max_segments
+        self.records_written = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="museino-recorder", daemon=True)
+        self._file = None
+        self._segment_index = 0
+        self._segment_size = 0
+
+    def start(self) -> "SessionRecorder":
+        """
+        Create the session directory and start the writer thread.
+        """
+        os.makedirs(self.session_directory, exist_ok=True)
+        self._thread.start()
+        print(f"[REC] Recording session to {self.session_directory}")
+        return self
+
+    def stop(self):
+        """
+        Write everything queued so far and close the current segment.
+        """
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def record_telemetry(self, camera_id: str, timestamp: float, message: dict):
+        """
+        Queue a telemetry message (as received, before processing) with its normalised timestamp.
+        """
+        self._queue.put({"kind": "telemetry", "ts": timestamp, "cam_id": camera_id, "message": dict(message)})
+
+    def record_event(self, timestamp: float, event_type: str, camera_id: str, payload: Optional[dict]):
+        """
+        Queue an event (EventStore subscriber signature).
+        """
+        self._queue.put({"kind": "event", "ts": timestamp, "cam_id": camera_id, "event": event_type, "payload": payload or {}})
+
+    def _open_next_segment(self):
+        if self._file is not None:
+            self._file.close()
+        self._segment_index += 1
+        path = os.path.join(self.session_directory, f"segment-{self._segment_index:05d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self._segment_size = 0
+        self._write({"kind": "header", "version": RECORD_FORMAT_VERSION, "segment": self._segment_index, "created": time.time()})
+        if self.max_segments > 0:
+            segments = sorted(name for name in os.listdir(self.session_directory) if name.startswith("segment-"))
+            for name in segments[:-self.max_segments]:
+                os.remove(os.path.join(self.session_directory, name))
+
+    def _write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        self._file.write(line)
+        # ensure_ascii=False: non-ASCII characters take several bytes on disk
+        self._segment_size += len(line.encode("utf-8"))
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                record = False
+            try:
+                if record is None:
+                    break
+                if record:
+                    if self._file is None or self._segment_size >= self.segment_bytes:
+                        self._open_next_segment()
+                    self._write(record)
+                    self.records_written += 1
+                if self._file is not None and time.monotonic() - last_flush >= self.flush_seconds:
+                    self._file.flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                print(f"[REC] Error while writing: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+# Recorder of the running dashboard, None when recording is disabled
+active_recorder: Optional[SessionRecorder] = None
+
+def start_recording(export_directory: str, segment_bytes: int, flush_seconds: float = 1.0, max_segments: int = 0) -> SessionRecorder:
+    """
+    Start recording telemetry (via record_telemetry) and every event appended to the event log.
+    """
+    global active_recorder
+    from core.state import event_log
+    active_recorder = SessionRecorder(export_directory, segment_bytes, flush_seconds, max_segments).start()
+    event_log.subscribe(active_recorder.record_event)
+    return active_recorder
+
+def record_telemetry(camera_id: str, timestamp: float, message: dict):
+    """
+    Record a telemetry message when recording is enabled (no-op otherwise).
+    """
+    if active_recorder is not None:
+        active_recorder.record_telemetry(camera_id, timestamp, message)
+
+def iter_session_records(path: str) -> Iterator[dict]:
+    """
+    Yield the records of a session directory (all segments in order) or of a single segment file.
+    """
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))
+                 if name.startswith("segment-") and name.endswith(".jsonl")]
+    else:
+        files = [path]
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # e.g. last line of a segment cut by a crash
+                if record.get("kind") != "header":
+                    yield record
@@ -4,7 +4,7 @@ import time
 import threading
 from typing import Optional
 
-from .state import data_lock, latest_data_by_camera, event_log, get_current_timestamp
+from .state import event_log, get_camera_shard, get_current_timestamp
 
 ZANT_RE = re.compile(r"label\s*=\s*([A-Za-z0-9_]+).*?prob\s*=\s*([0-9]*\.?[0-9]+)")
 
@@ -27,16 +27,11 @@ def _push_event(ev_type: str, cam_id: str, payload: dict):
     """
     Append an event to the shared event log.
     """
-    event_log.append({
-        "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(get_current_timestamp())),
-        "cam_id": cam_id,
-        "event": ev_type,
-        "value": str(payload)
-    })
+    event_log.append(get_current_timestamp(), ev_type, cam_id, payload)
 
 def serial_reader(port: str, baud: int, cam_id: str):
     """
-    Read the Nicla FOMO serial port, update latest_data_by_camera[cam_id]
+    Read the Nicla FOMO serial port, update the latest packet of the cam_id shard
     with mode='fomo', fomo_label, fomo_prob and push a 'FOMO' event.
     """
     try:
@@ -68,15 +63,17 @@ def serial_reader(port: str, baud: int, cam_id: str):
                         continue
                     label, prob = parsed
                     ts = get_current_timestamp()
-                    with data_lock:
-                        latest_data_by_camera[cam_id] = {
+                    shard = get_camera_shard(cam_id)
+                    with shard.lock:
+                        shard.latest = {
                             "ts": ts,
                             "cam_id": cam_id,
                             "mode": "fomo",
                             "fomo_label": label,
                             "fomo_prob": prob
                         }
-                        _push_event("FOMO", cam_id, {"label": label, "prob": prob})
+                        shard.version += 1
+                    _push_event("FOMO", cam_id, {"label": label, "prob": prob})
 
         except Exception as e:
             print(f"[SER {cam_id}] serial error: {e}")
@@ -1,13 +1,12 @@
 
 from __future__ import annotations
+import itertools
+import json
 import time
 import threading
-from collections import defaultdict, deque
-from typing import Dict, Deque, Tuple
-
-# Global lock used to protect shared data structures across threads
-# Required to avoid race conditions for UDP data and events
-data_lock = threading.Lock()
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
 
 def get_current_timestamp() -> float:
     """
@@ -16,28 +15,338 @@ def get_current_timestamp() -> float:
     """
     return time.time()
 
+class TimeSeriesRingBuffer:
+    """
+    Fixed-capacity columnar time series (timestamp, distance, fps, people) backed by NumPy.
+    Every sample is written twice, at i and i + capacity, so the most recent n samples are
+    always one contiguous slice: append is O(1) and window queries return views without copying.
+    Window lookups use binary search on the timestamp column while the retained timestamps are
+    non-decreasing; after an out-of-order sample they fall back to a mask only until the pair
+    that was out of order has been overwritten.
+    """
+    COLUMNS = ("timestamp", "distance_mm", "fps", "people_count")
+
+    def __init__(self, capacity: int = 20000):
+        self.capacity = max(1, int(capacity))
+        self._data = np.full((len(self.COLUMNS), 2 * self.capacity), np.nan, dtype=np.float64)
+        self._next = 0  # next write position in [0, capacity)
+        self._size = 0
+        self._appended = 0  # samples appended since the last clear()
+        # Index (in append order) of the latest sample older than its predecessor;
+        # the retained samples are ordered once that predecessor has been overwritten
+        self._last_inversion = 0
+
+    def append(self, timestamp: float, distance_mm: float, fps: float, people_count: float):
+        """
+        Append one sample, overwriting the oldest when full.
+        """
+        if self._size and timestamp < self._data[0, self._next - 1 + self.capacity]:
+            self._last_inversion = self._appended
+        sample = (timestamp, distance_mm, fps, people_count)
+        self._data[:, self._next] = sample
+        self._data[:, self._next + self.capacity] = sample
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self._appended += 1
+
+    @property
+    def _monotonic(self) -> bool:
+        """
+        True when the retained timestamps are non-decreasing.
+        """
+        # The oldest retained sample has index _appended - _size
+        return self._last_inversion <= self._appended - self._size
+
+    def view(self) -> "np.ndarray":
+        """
+        Return a read-only (4, n) view of all samples, oldest first.
+        """
+        end = self._next + self.capacity
+        view = self._data[:, end - self._size:end]
+        view.flags.writeable = False
+        return view
+
+    def window(self, start_timestamp: float, end_timestamp: Optional[float] = None) -> "np.ndarray":
+        """
+        Return the (4, k) samples with start_timestamp <= timestamp (<= end_timestamp), oldest first.
+        A view when timestamps are ordered, otherwise a filtered copy.
+        """
+        data = self.view()
+        timestamps = data[0]
+        if not self._monotonic:
+            mask = timestamps >= start_timestamp
+            if end_timestamp is not None:
+                mask &= timestamps <= end_timestamp
+            return data[:, mask]
+        lo = int(np.searchsorted(timestamps, start_timestamp, side="left"))
+        hi = len(timestamps) if end_timestamp is None else int(np.searchsorted(timestamps, end_timestamp, side="right"))
+        return data[:, lo:hi]
+
+    def last(self) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Return the most recent sample, or None when empty.
+        """
+        if not self._size:
+            return None
+        return tuple(float(v) for v in self._data[:, self._next - 1 + self.capacity])
+
+    def clear(self):
+        """
+        Drop every sample (the memory is kept).
+        """
+        self._next = 0
+        self._size = 0
+        self._appended = 0
+        self._last_inversion = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Tuple[float, float, float, float]]:
+        # Compatibility with code that iterated the old deque of tuples
+        return (tuple(sample) for sample in self.view().T.tolist())
+
+class EventStore:
+    """
+    Preallocated ring of structured events: numeric timestamp, event code, camera index,
+    numeric payload fields (NaN when absent) and an optional dict with any other payload.
+
+    append() never blocks on readers: writers reserve a sequence number from an itertools
+    counter (atomic under the GIL), invalidate the slot, fill the columns and publish the
+    sequence number last; only the final high-water mark update takes a tiny lock. Readers gather slots with NumPy and keep only those whose sequence
+    number is valid both before and after the copy, so a slot being overwritten is skipped.
+    Rows are formatted for display (ISO time, JSON payload) only by tail()/page().
+    """
+    PAYLOAD_FIELDS = ("distance_mm", "safe_distance_mm", "dwell_seconds", "prob")
+    INTEGER_FIELDS = ("safe_distance_mm",)
+    COLUMNS = ["time", "cam_id", "event", "value"]
+
+    def __init__(self, capacity: int = 100000):
+        self.capacity = max(1, int(capacity))
+        self._seq = np.full(self.capacity, -1, dtype=np.int64)
+        self._timestamp = np.zeros(self.capacity, dtype=np.float64)
+        self._code = np.zeros(self.capacity, dtype=np.int32)
+        self._camera = np.zeros(self.capacity, dtype=np.int32)
+        self._values = np.full((len(self.PAYLOAD_FIELDS), self.capacity), np.nan, dtype=np.float64)
+        self._extra = np.empty(self.capacity, dtype=object)
+        self._counter = itertools.count()
+        self._high = 0  # one past the highest published sequence number
+        self._published = 0  # appends completed so far, the change counter behind version
+        self._high_lock = threading.Lock()  # held only to advance _high and _published
+        self._start = 0  # first sequence number visible after clear()
+        # Interned event names and camera ids; the lock is only taken for names never seen before
+        self._names_lock = threading.Lock()
+        self._event_names: List[str] = []
+        self._event_codes: Dict[str, int] = {}
+        self._camera_ids: List[str] = []
+        self._camera_indexes: Dict[str, int] = {}
+        # Callables invoked as fn(timestamp, event_type, camera_id, payload) after each append
+        self._subscribers: List[Any] = []
+
+    def subscribe(self, callback):
+        """
+        Call callback(timestamp, event_type, camera_id, payload) for every appended event (e.g. persistence).
+        """
+        self._subscribers.append(callback)
+
+    def _intern(self, value: str, codes: Dict[str, int], names: List[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            with self._names_lock:
+                code = codes.get(value)
+                if code is None:
+                    names.append(value)
+                    code = codes[value] = len(names) - 1
+        return code
+
+    def append(self, timestamp: float, event_type: str, camera_id: str, payload: Optional[dict] = None):
+        """
+        Record an event. Safe to call from any thread without holding a shard lock.
+        """
+        values = [np.nan] * len(self.PAYLOAD_FIELDS)
+        extra = None
+        for key, value in (payload or {}).items():
+            if key in self.PAYLOAD_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[self.PAYLOAD_FIELDS.index(key)] = value
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        code = self._intern(str(event_type), self._event_codes, self._event_names)
+        camera = self._intern(str(camera_id), self._camera_indexes, self._camera_ids)
+
+        seq = next(self._counter)
+        slot = seq % self.capacity
+        self._seq[slot] = -1  # readers skip the slot while it is being written
+        self._timestamp[slot] = timestamp
+        self._code[slot] = code
+        self._camera[slot] = camera
+        self._values[:, slot] = values
+        self._extra[slot] = extra
+        self._seq[slot] = seq
+        # Check-and-store must be atomic: with several writers a preempted one could
+        # otherwise lower _high and hide published events. _published counts every
+        # append, so a late writer filling a gap below _high still changes version
+        with self._high_lock:
+            if seq >= self._high:
+                self._high = seq + 1
+            self._published += 1
+        for callback in self._subscribers:
+            callback(timestamp, event_type, camera_id, payload)
+
+    @property
+    def version(self) -> int:
+        """
+        Change counter: number of appends published so far. It grows on every append
+        (including a late one landing below the newest event) and never decreases,
+        not even on clear().
+        """
+        return self._published
+
+    def __len__(self) -> int:
+        return self._high - max(self._start, self._high - self.capacity)
+
+    def clear(self):
+        """
+        Hide every event recorded so far.
+        """
+        self._start = self._high
+
+    def _gather(self, low: int, high: int) -> Dict[str, "np.ndarray"]:
+        seqs = np.arange(low, high, dtype=np.int64)
+        slots = seqs % self.capacity
+        valid = self._seq[slots] == seqs
+        columns = {
+            "timestamp": self._timestamp[slots],
+            "code": self._code[slots],
+            "camera": self._camera[slots],
+            "values": self._values[:, slots],
+            "extra": self._extra[slots],
+        }
+        # Drop slots that were overwritten while we were copying them
+        valid &= self._seq[slots] == seqs
+        columns = {name: (column[:, valid] if name == "values" else column[valid]) for name, column in columns.items()}
+        return columns
+
+    def _records(self, columns: Dict[str, "np.ndarray"]) -> List[dict]:
+        records = []
+        for i in range(len(columns["timestamp"])):
+            payload = {}
+            for field_index, field in enumerate(self.PAYLOAD_FIELDS):
+                value = columns["values"][field_index, i]
+                if value == value:  # skip NaN (absent)
+                    payload[field] = int(value) if field in self.INTEGER_FIELDS and value.is_integer() else float(value)
+            if columns["extra"][i]:
+                payload.update(columns["extra"][i])
+            records.append({
+                "time": datetime.fromtimestamp(columns["timestamp"][i]).isoformat(timespec="seconds"),
+                "cam_id": self._camera_ids[columns["camera"][i]],
+                "event": self._event_names[columns["code"][i]],
+                "value": json.dumps(payload, ensure_ascii=False, default=str),
+            })
+        return records
+
+    def _visible_range(self) -> Tuple[int, int]:
+        high = self._high
+        return max(self._start, high - self.capacity), high
+
+    def tail(self, limit: int = 0) -> List[dict]:
+        """
+        Return the last limit events (all retained events when 0) as display rows, oldest first.
+        """
+        low, high = self._visible_range()
+        if limit > 0:
+            low = max(low, high - limit)
+        return self._records(self._gather(low, high))
+
+    def page(self, page_index: int, page_size: int) -> List[dict]:
+        """
+        Return one page of display rows, page 0 holding the newest events (oldest first within the page).
+        """
+        low, high = self._visible_range()
+        page_high = max(low, high - page_index * page_size)
+        return self._records(self._gather(max(low, page_high - page_size), page_high))
+
+class CameraShard:
+    """
+    Everything known about one camera, guarded by the shard's own lock.
+    Writers for different cameras never contend; readers lock one shard at a time
+    just long enough to copy what they display, so each camera is read consistently.
+    """
+
+    def __init__(self, camera_id: str, capacity: int):
+        self.camera_id = camera_id
+        self.lock = threading.Lock()
+        # Latest packet received (empty until the first one arrives)
+        self.latest: dict = {}
+        # Time series: columns (timestamp, distance, fps, people count)
+        self.series = TimeSeriesRingBuffer(capacity)
+        # Alarm state, tracking alert start time and last change
+        self.alert_state = {"in_alert": False, "t_start": None, "last_change": None}
+        # Change counter, bumped on every update; the UI compares it between ticks
+        # to rebuild only the panels whose data changed
+        self.version = 0
+
+    def reset(self):
+        """
+        Drop every measurement and the alarm state (the caller must hold the shard lock).
+        """
+        self.latest = {}
+        self.series.clear()
+        self.alert_state = {"in_alert": False, "t_start": None, "last_change": None}
+        # Bump instead of resetting so a UI holding old versions still sees a change
+        self.version += 1
+
 # Shared structures used to store application state
-# Hold the latest packet received for each camera ID
-latest_data_by_camera: Dict[str, dict] = {}
-# Time series of data for each camera: list of tuples (timestamp, distance, fps, people count)
-# Use a deque with maxlen to bound memory usage and retain only recent samples
-time_series_by_camera: Dict[str, Deque[Tuple[float, float, float, float]]] = defaultdict(lambda: deque(maxlen=20000))
+# One shard per camera ID; _shards_lock is only taken when a new camera appears
+camera_shards: Dict[str, CameraShard] = {}
+_shards_lock = threading.Lock()
+# Preallocated ring buffers bound memory usage and retain only the most recent samples
+time_series_capacity = 20000
 # Event log for alarms and other notifications, capped in size to limit memory usage
-event_log: Deque[dict] = deque(maxlen=100000)
-
-# Alarm state for each camera, tracking alert start time and last change
-alert_state_by_camera: Dict[str, dict] = defaultdict(lambda: {"in_alert": False, "t_start": None, "last_change": None})
+# Appending does not require any lock (see EventStore)
+event_log = EventStore(100000)
 # Offset applied per camera to normalise relative timestamps into absolute ones
 timestamp_offset_by_camera: Dict[str, float] = {}
 
+def get_camera_shard(camera_id: str) -> CameraShard:
+    """
+    Return the shard of a camera, creating it on first use.
+    """
+    shard = camera_shards.get(camera_id)
+    if shard is None:
+        with _shards_lock:
+            shard = camera_shards.get(camera_id)
+            if shard is None:
+                shard = camera_shards[camera_id] = CameraShard(camera_id, time_series_capacity)
+    return shard
+
+def list_cameras() -> List[str]:
+    """
+    Return the sorted IDs of the cameras that have sent at least one packet.
+    """
+    return sorted(camera_id for camera_id, shard in list(camera_shards.items()) if shard.latest)
+
+def get_event_log_version() -> int:
+    """
+    Return the current event log version (total events appended).
+    """
+    return event_log.version
+
+def configure_time_series(max_data_points: int):
+    """
+    Set the per-camera ring buffer capacity (applies to cameras seen afterwards).
+    """
+    global time_series_capacity
+    time_series_capacity = max(1, int(max_data_points))
+
 def clear_all_data():
     """
     Clear every measurement and state structure.
     Called at startup to guarantee a clean slate.
     """
-    global latest_data_by_camera, time_series_by_camera, event_log, alert_state_by_camera, timestamp_offset_by_camera
-    latest_data_by_camera.clear()
-    time_series_by_camera.clear()
+    for shard in list(camera_shards.values()):
+        with shard.lock:
+            shard.reset()
     event_log.clear()
-    alert_state_by_camera.clear()
     timestamp_offset_by_camera.clear()
@@ -1,15 +1,53 @@
 from __future__ import annotations
 import socket
+import selectors
+import struct
 import json
 import sys
 import os
-from typing import Tuple
+import time
+from typing import List, Optional, Tuple
 
 # Add the project path so we can import local modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-from core.state import data_lock, latest_data_by_camera, time_series_by_camera
+from core.state import CameraShard, get_camera_shard, event_log
 from core.normalization import normalize_timestamp
-from core.alerts import process_alert
+from core.alerts import process_alert, process_alert_batch
+from core.recorder import record_telemetry
+
+# Linux-only socket option: the kernel attaches its cumulative drop counter to every datagram
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40 if sys.platform.startswith("linux") else None)
+MAX_DATAGRAM_BYTES = 8192
+# Seconds between the periodic "[UDP] ..." ingestion summaries
+STATS_REPORT_SECONDS = 10.0
+
+# Ingestion counters, one dict per listener thread (each only updated by its own thread)
+# - received: datagrams read from the socket
+# - processed: telemetry/event messages applied to the shared state
+# - malformed: empty, non-JSON or invalid messages
+# - dropped: datagrams dropped by the kernel because the receive buffer was full (Linux only)
+# - truncated: datagrams larger than MAX_DATAGRAM_BYTES
+# - errors: messages that failed while being applied
+INGEST_STAT_KEYS = ("received", "processed", "malformed", "dropped", "truncated", "errors", "batches")
+_worker_stats: List[dict] = []
+
+def _new_worker_stats() -> dict:
+    """
+    Register the counters of a new listener thread.
+    """
+    stats = dict.fromkeys(INGEST_STAT_KEYS, 0)
+    _worker_stats.append(stats)
+    return stats
+
+def get_ingest_stats() -> dict:
+    """
+    Return the UDP ingestion counters summed over every listener thread.
+    """
+    totals = dict.fromkeys(INGEST_STAT_KEYS, 0)
+    for stats in list(_worker_stats):
+        for key in INGEST_STAT_KEYS:
+            totals[key] += stats[key]
+    return totals
 
 def _ensure_message(message: dict, address: Tuple[str, int]) -> dict:
     """
@@ -30,10 +68,10 @@ def _ensure_message(message: dict, address: Tuple[str, int]) -> dict:
     message.setdefault("mode", "tof")  # Default mode
     return message
 
-def _process_telemetry_message(message: dict, camera_id: str, timestamp: float, safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float):
+def _extract_telemetry_values(message: dict, safe_distance_mm: int) -> Tuple[Optional[float], float, Optional[float]]:
     """
-    Process a telemetry message received via UDP.
-    Extract the distance, FPS and people count, update shared state and run alarm logic.
+    Extract the distance, FPS (NaN when missing) and people count from a telemetry message.
+    Pure function: safe to call without holding any lock.
     """
     # Extract the main values from the message
     distance_mm = float(message.get("tof_mm")) if message.get("tof_mm") is not None else None
@@ -48,61 +86,232 @@ def _process_telemetry_message(message: dict, camera_id: str, timestamp: float,
         elif distance_mm is not None:
             # Fallback: assume 1 person if closer than the safe distance, otherwise 0
             people_count = 1.0 if distance_mm < safe_distance_mm else 0.0
+    return distance_mm, frames_by_second, people_count
+
+def _store_telemetry(shard: CameraShard, message: dict, timestamp: float, values: Tuple[Optional[float], float, Optional[float]]):
+    """
+    Store already extracted telemetry values in the camera's shard, without the alarm logic.
+    The caller must hold shard.lock.
+    """
+    distance_mm, frames_by_second, people_count = values
+    # Update the message with processed and normalised data
+    message["ts"] = timestamp
+    message["people"] = people_count
+    message["fps"] = frames_by_second if frames_by_second == frames_by_second else None  # Convert NaN into None
+    shard.latest = message
+    shard.version += 1
+
+    if distance_mm is not None:
+        # Append a point to the time series used for the chart
+        shard.series.append(
+            timestamp, distance_mm,
+            frames_by_second if frames_by_second == frames_by_second else float("nan"),
+            people_count if people_count is not None else float("nan")
+        )
+
+def _apply_telemetry(shard: CameraShard, message: dict, timestamp: float, values: Tuple[Optional[float], float, Optional[float]],
+                     safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float):
+    """
+    Store already extracted telemetry values in the camera's shard and run the alarm logic.
+    The caller must hold shard.lock.
+    """
+    _store_telemetry(shard, message, timestamp, values)
+    distance_mm = values[0]
+    if distance_mm is not None:
+        # Run the alarm logic based on the measured distance
+        process_alert(shard.camera_id, distance_mm, timestamp, safe_distance_mm, hysteresis_mm, min_dwell_seconds)
+
+def _apply_telemetry_batch(shard: CameraShard, items: List[Tuple[dict, float, Tuple[Optional[float], float, Optional[float]]]],
+                           safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float) -> Tuple[int, int]:
+    """
+    Store a camera's (message, timestamp, values) items in arrival order, then run the
+    alarm logic once over all their distances with process_alert_batch.
+    The caller must hold shard.lock. Return the number of applied and failed messages.
+    """
+    applied = errors = 0
+    alert_timestamps, alert_distances = [], []
+    for message, timestamp, values in items:
+        try:
+            _store_telemetry(shard, message, timestamp, values)
+        except Exception:
+            errors += 1
+            continue
+        applied += 1
+        if values[0] is not None:
+            alert_timestamps.append(timestamp)
+            alert_distances.append(values[0])
+    if alert_distances:
+        try:
+            process_alert_batch(shard.camera_id, alert_timestamps, alert_distances,
+                                safe_distance_mm, hysteresis_mm, min_dwell_seconds)
+        except Exception:
+            errors += 1
+    return applied, errors
 
-    with data_lock:
-        # Update the message with processed and normalised data
-        message["ts"] = timestamp
-        message["people"] = people_count
-        message["fps"] = frames_by_second if frames_by_second == frames_by_second else None  # Convert NaN into None
-        latest_data_by_camera[camera_id] = message
-
-        if distance_mm is not None:
-            # Append a point to the time series used for the chart
-            time_series_by_camera[camera_id].append((
-                timestamp, distance_mm,
-                frames_by_second if frames_by_second == frames_by_second else float("nan"),
-                people_count if people_count is not None else float("nan")
-            ))
-            # Run the alarm logic based on the measured distance
-            process_alert(camera_id, distance_mm, timestamp, safe_distance_mm, hysteresis_mm, min_dwell_seconds)
-
-def udp_listener(udp_ip_address: str, udp_port_number: int, safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float):
+def _process_telemetry_message(message: dict, camera_id: str, timestamp: float, safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float):
+    """
+    Process a telemetry message received via UDP.
+    Extract the distance, FPS and people count, update shared state and run alarm logic.
+    """
+    values = _extract_telemetry_values(message, safe_distance_mm)
+    shard = get_camera_shard(camera_id)
+    with shard.lock:
+        _apply_telemetry(shard, message, timestamp, values, safe_distance_mm, hysteresis_mm, min_dwell_seconds)
+
+def _decode_packet(data: bytes, address: Tuple[str, int]) -> Optional[Tuple[dict, str, float]]:
+    """
+    Decode one datagram into (message, camera_id, normalised timestamp).
+    Return None for empty packets; raise ValueError/TypeError/KeyError for malformed ones.
+    """
+    line = data.decode("utf-8", errors="ignore").strip()
+    if not line:
+        return None
+    message = json.loads(line)  # json.JSONDecodeError is a ValueError
+    if not isinstance(message, dict):
+        raise ValueError("message is not a JSON object")
+    message = _ensure_message(message, address)
+    camera_id = message["cam_id"]
+    timestamp = normalize_timestamp(camera_id, float(message["ts"]))
+    return message, camera_id, timestamp
+
+def _drain_socket(sock: socket.socket, max_batch: int, stats: dict) -> Tuple[List[Tuple[bytes, Tuple[str, int]]], Optional[int]]:
+    """
+    Read every datagram already queued on the non-blocking socket (up to max_batch).
+    Return the packets and the kernel's cumulative drop counter when available.
+    """
+    packets = []
+    kernel_dropped = None
+    use_recvmsg = hasattr(sock, "recvmsg")
+    ancillary_size = socket.CMSG_SPACE(4) if (use_recvmsg and SO_RXQ_OVFL is not None) else 0
+    while len(packets) < max_batch:
+        try:
+            if use_recvmsg:
+                data, ancillary, flags, address = sock.recvmsg(MAX_DATAGRAM_BYTES, ancillary_size)
+            else:
+                data, address = sock.recvfrom(MAX_DATAGRAM_BYTES)
+                ancillary, flags = [], 0
+        except (BlockingIOError, InterruptedError):
+            break
+        except OSError:
+            # e.g. ICMP port unreachable surfaced as ECONNREFUSED on some platforms
+            break
+
+        stats["received"] += 1
+        for level, kind, payload in ancillary:
+            if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL and len(payload) >= 4:
+                kernel_dropped = struct.unpack("I", payload[:4])[0]
+        if flags & getattr(socket, "MSG_TRUNC", 0):
+            stats["truncated"] += 1
+            continue
+        packets.append((data, address))
+    return packets, kernel_dropped
+
+def _ingest_batch(packets: List[Tuple[bytes, Tuple[str, int]]], safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float,
+                  stats: dict):
+    """
+    Decode a batch of datagrams without any lock, then apply each camera's messages
+    in arrival order under a single acquisition of that camera's shard lock.
+    Consecutive telemetry messages are applied as one run (alarm logic vectorised over
+    the run); an event message first flushes the pending run, so a camera's alarm
+    transitions and its UDP events reach the event log in wire order.
+    Order across different cameras is not preserved.
+    """
+    messages_by_camera: dict[str, list] = {}
+    for data, address in packets:
+        try:
+            item = _decode_packet(data, address)
+        except (ValueError, TypeError, KeyError):
+            stats["malformed"] += 1
+            continue
+        if item is None:
+            stats["malformed"] += 1
+            continue
+        message, camera_id, timestamp = item
+        values = None if "event" in message else _extract_telemetry_values(message, safe_distance_mm)
+        if values is not None:
+            record_telemetry(camera_id, timestamp, message)
+        messages_by_camera.setdefault(camera_id, []).append((message, timestamp, values))
+
+    for camera_id, items in messages_by_camera.items():
+        shard = get_camera_shard(camera_id)
+        with shard.lock:
+            run = []
+            for message, timestamp, values in items + [(None, None, None)]:
+                if message is not None and values is not None:
+                    run.append((message, timestamp, values))
+                    continue
+                if run:
+                    # Handle them as regular telemetry
+                    applied, errors = _apply_telemetry_batch(shard, run, safe_distance_mm, hysteresis_mm, min_dwell_seconds)
+                    stats["processed"] += applied
+                    stats["errors"] += errors
+                    run = []
+                if message is not None:
+                    # Event messages (e.g. manual alarm) go to the lock-free event log
+                    payload = {key: value for key, value in message.items() if key not in ("event", "cam_id", "ts")}
+                    event_log.append(timestamp, message["event"], camera_id, payload)
+                    stats["processed"] += 1
+    stats["batches"] += 1
+
+def udp_listener(udp_ip_address: str, udp_port_number: int, safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float,
+                 receive_buffer_bytes: int = 4 * 1024 * 1024, max_batch: int = 1024, reuse_port: bool = False,
+                 worker_name: str = "UDP"):
     """
     Continuously listen for UDP packets sent by the MuseINO cameras.
-    For each packet, decode the JSON, normalise the data and update global state.
-    Handle both telemetry messages and alarm events.
+    On every wakeup drain all queued datagrams, decode them without any lock and
+    apply them to the per-camera shards in batches of up to max_batch messages.
+    Handle both telemetry messages and alarm events; errors are counted in the
+    ingestion stats and summarised periodically instead of printed per packet.
+    With reuse_port several listeners share the port (SO_REUSEPORT): the kernel
+    spreads senders across them, so different cameras are ingested in parallel
+    while each camera keeps its packet order.
     """
+    stats = _new_worker_stats()
     # Create and configure the UDP socket
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        # A larger kernel buffer absorbs bursts while a batch is being applied
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_bytes)
+    except OSError as e:
+        print(f"[{worker_name}] Could not set receive buffer to {receive_buffer_bytes} bytes: {e}")
+    if SO_RXQ_OVFL is not None:
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+        except OSError:
+            pass  # drop counter unavailable on this platform
     sock.bind((udp_ip_address, udp_port_number))
-    print(f"[UDP] Listening on {udp_ip_address}:{udp_port_number}")
+    sock.setblocking(False)
+    print(f"[{worker_name}] Listening on {udp_ip_address}:{udp_port_number}")
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    last_report_time = time.monotonic()
+    last_report = dict(stats)
 
     while True:
         try:
-            # Receive data from the socket (blocking)
-            data, address = sock.recvfrom(8192)
-            line = data.decode("utf-8", errors="ignore").strip()
-            if not line:
-                continue  # Skip empty packets
-
-            # Decode the received JSON message
-            message = json.loads(line)
-            message = _ensure_message(message, address)
-
-            camera_id = message["cam_id"]
-            timestamp = normalize_timestamp(camera_id, float(message["ts"]))
-
-            if "event" in message:
-                # Event message (e.g. manual alarm) - store it in the event log
-                with data_lock:
-                    from core.state import event_log
-                    event_log.append(message)
-                continue  # Do not treat it as regular telemetry
-
-            # Handle it as regular telemetry
-            _process_telemetry_message(message, camera_id, timestamp, safe_distance_mm, hysteresis_mm, min_dwell_seconds)
-
-        except json.JSONDecodeError:
-            print("[UDP] Invalid JSON received")
+            # Wait until at least one datagram is queued, then drain the socket
+            if selector.select(timeout=STATS_REPORT_SECONDS):
+                while True:
+                    packets, kernel_dropped = _drain_socket(sock, max_batch, stats)
+                    if kernel_dropped is not None:
+                        stats["dropped"] = kernel_dropped
+                    if packets:
+                        _ingest_batch(packets, safe_distance_mm, hysteresis_mm, min_dwell_seconds, stats)
+                    if len(packets) < max_batch:
+                        break
+
+            now = time.monotonic()
+            if now - last_report_time >= STATS_REPORT_SECONDS:
+                current = dict(stats)
+                problems = {key: current[key] - last_report[key] for key in ("malformed", "dropped", "truncated", "errors")}
+                if any(problems.values()):
+                    details = ", ".join(f"{value} {key}" for key, value in problems.items() if value)
+                    print(f"[{worker_name}] {current['received'] - last_report['received']} packets in the last "
+                          f"{now - last_report_time:.0f}s ({details})")
+                last_report_time, last_report = now, current
+
         except Exception as e:
-            print("[UDP] Error while processing:", e)
+            print(f"[{worker_name}] Error while processing:", e)
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+# Add the current path so we can import local modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from core.config import load_configuration
+from core.recorder import iter_session_records
+from core.state import clear_all_data, configure_time_series, event_log, get_camera_shard
+from core.udp import _apply_telemetry_batch, _extract_telemetry_values, _process_telemetry_message
+
+# Telemetry messages applied per call when replaying as fast as possible
+REPLAY_BATCH_SIZE = 4096
+# Events the alarm logic regenerates from telemetry; FOMO and manual UDP events cannot be replayed
+REPLAYED_EVENT_TYPES = ("ALERT_ENTER", "ALERT_EXIT")
+
+def replay_session(path: str, speed: float, safe_distance_mm: int, hysteresis_mm: int, min_dwell_seconds: float,
+                   scalar: bool = False) -> dict:
+    """
+    Feed the telemetry of a recorded session back through the ingestion pipeline.
+    speed=1 replays in real time, speed=10 ten times faster, speed=0 as fast as possible.
+    At speed=0 messages are applied per camera in batches (vectorised alarm logic) unless
+    scalar is set, which keeps the one-message-at-a-time path; both produce the same events.
+    Return counters comparing the recorded ALERT_ENTER/EXIT events with the ones produced by
+    the replay (other events do not come from telemetry, so they are not compared).
+    """
+    recorded_events = Counter()
+    messages = 0
+    first_timestamp = None
+    start = time.perf_counter()
+    processing_seconds = 0.0
+    batched = speed <= 0 and not scalar
+    pending: dict[str, list] = {}
+    pending_count = 0
+
+    def flush():
+        # Apply the buffered messages camera by camera, keeping each camera's order
+        for camera_id, items in pending.items():
+            shard = get_camera_shard(camera_id)
+            with shard.lock:
+                _apply_telemetry_batch(shard, items, safe_distance_mm, hysteresis_mm, min_dwell_seconds)
+        pending.clear()
+
+    for record in iter_session_records(path):
+        if record["kind"] == "event":
+            if record["event"] in REPLAYED_EVENT_TYPES:
+                recorded_events[record["event"]] += 1
+            continue
+        if record["kind"] != "telemetry":
+            continue
+
+        timestamp = float(record["ts"])
+        if first_timestamp is None:
+            first_timestamp = timestamp
+        if speed > 0:
+            # Sleep until this sample is due according to the recorded timeline
+            delay = (timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter()
+        if batched:
+            message = dict(record["message"])
+            values = _extract_telemetry_values(message, safe_distance_mm)
+            pending.setdefault(record["cam_id"], []).append((message, timestamp, values))
+            pending_count += 1
+            if pending_count >= REPLAY_BATCH_SIZE:
+                flush()
+                pending_count = 0
+        else:
+            _process_telemetry_message(dict(record["message"]), record["cam_id"], timestamp,
+                                       safe_distance_mm, hysteresis_mm, min_dwell_seconds)
+        processing_seconds += time.perf_counter() - t0
+        messages += 1
+
+    t0 = time.perf_counter()
+    flush()
+    processing_seconds += time.perf_counter() - t0
+
+    replayed_events = Counter(row["event"] for row in event_log.tail() if row["event"] in REPLAYED_EVENT_TYPES)
+    return {
+        "messages": messages,
+        "wall_seconds": time.perf_counter() - start,
+        "processing_seconds": processing_seconds,
+        "recorded_events": dict(recorded_events),
+        "replayed_events": dict(replayed_events),
+    }
+
+def main():
+    """
+    Command line entry point: replay a recorded session for offline analysis or benchmarking.
+    Thresholds default to the dashboard configuration (MUSEINO_* environment variables).
+    """
+    configuration = load_configuration()
+    parser = argparse.ArgumentParser(description="Replay a recorded MuseINO session through the telemetry pipeline.")
+    parser.add_argument("session", help="Session directory (or a single segment-*.jsonl file)")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed factor (1 = real time, 0 = as fast as possible)")
+    parser.add_argument("--safe-mm", type=int, default=configuration.safe_distance_mm)
+    parser.add_argument("--hyst-mm", type=int, default=configuration.hysteresis_mm)
+    parser.add_argument("--min-dwell", type=float, default=configuration.min_dwell_seconds)
+    parser.add_argument("--scalar", action="store_true",
+                        help="Apply messages one at a time even at --speed 0 (to compare with the batched alarm logic)")
+    args = parser.parse_args()
+
+    clear_all_data()
+    configure_time_series(configuration.max_data_points)
+    stats = replay_session(args.session, args.speed, args.safe_mm, args.hyst_mm, args.min_dwell, args.scalar)
+
+    rate = stats["messages"] / stats["processing_seconds"] if stats["processing_seconds"] > 0 else float("nan")
+    print(f"Replayed {stats['messages']} telemetry messages in {stats['wall_seconds']:.2f}s "
+          f"({stats['processing_seconds']:.2f}s processing, {rate:,.0f} msg/s)")
+    print(f"{'event':<16} {'recorded':>10} {'replayed':>10}")
+    for event in sorted(set(stats["recorded_events"]) | set(stats["replayed_events"])):
+        print(f"{event:<16} {stats['recorded_events'].get(event, 0):>10} {stats['replayed_events'].get(event, 0):>10}")
+
+if __name__ == "__main__":
+    main()
@@ -108,6 +108,9 @@ def create_interface_layout():
 
             last_packet_debug_json = gr.JSON(label="Last Packet (Debug)")
 
+            # Per-session record of what each panel currently shows (see ui.update.snapshot_state)
+            render_state = gr.State({})
+
         with gr.TabItem("Artwork Statistics"):
             stats = generate_fake_statistics()
 
@@ -126,6 +129,7 @@ def create_interface_layout():
         "distance_over_time_plot": distance_over_time_plot,
         "alarm_events_data_table": alarm_events_data_table,
         "last_packet_debug_json": last_packet_debug_json,
+        "render_state": render_state,
         "visits_today_md": visits_today_md,
         "visits_month_md": visits_month_md,
         "visits_today_plot": visits_today_plot,
@@ -3,51 +3,89 @@ from datetime import datetime
 import os.path as op
 import os
 import sys
+import numpy as np
 import pandas as pd
 import gradio as gr
-import plotly.express as px
+import plotly.graph_objects as go
 import logging
 
 # Add the project path so we can import local modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from core.state import data_lock, latest_data_by_camera, time_series_by_camera, event_log, get_current_timestamp
+from core.state import camera_shards, get_current_timestamp, get_event_log_version, list_cameras
 from core.events import to_events_dataframe
+from core.downsample import downsample_indices
 from ui.components import create_empty_time_series_dataframe
 
 logger = logging.getLogger(__name__)
 
-def build_status_dataframe(cameras: list[str], safe_distance_mm: int) -> "pd.DataFrame":
+# Even without new samples the chart is rebuilt this often so old points leave the window
+PLOT_WINDOW_REFRESH_SECONDS = 5
+# Last value built for each panel, shared by every session: panel name -> (key, value)
+_panel_cache: dict[str, tuple] = {}
+
+def _copy_camera(camera: str, latest: bool = True, series: bool = True,
+                 window_start: float | None = None) -> tuple:
+    """
+    Copy one camera's state under its shard lock.
+    Return (latest packet, full (4, n) series, (4, n) window from window_start, version);
+    parts that were not requested are None. Ring buffer views never escape the lock.
+    """
+    shard = camera_shards.get(camera)
+    if shard is None:
+        return ({} if latest else None), (np.empty((4, 0)) if series else None), \
+               (np.empty((4, 0)) if window_start is not None else None), 0
+    with shard.lock:
+        return (dict(shard.latest) if latest else None,
+                np.array(shard.series.view()) if series else None,
+                np.array(shard.series.window(window_start)) if window_start is not None else None,
+                shard.version)
+
+def _local_times(timestamps: "np.ndarray") -> "pd.DatetimeIndex":
+    """
+    Convert Unix timestamps to local wall-clock times truncated to the second, in one
+    vectorised call (a per-sample datetime.fromtimestamp dominated the status table).
+    """
+    local_zone = datetime.now().astimezone().tzinfo
+    return pd.to_datetime(timestamps, unit="s", utc=True).tz_convert(local_zone).tz_localize(None).floor("s")
+
+def build_status_dataframe(cameras: list[str], safe_distance_mm: int, series_by_camera: dict | None = None,
+                           latest_data: dict | None = None) -> "pd.DataFrame":
     """
     Build a DataFrame with the current status of every camera.
     Include the latest data point for each camera plus the SAFE/ALERT zone.
+    series_by_camera / latest_data default to a copy of the live state, taken camera by camera.
     """
-    status_rows = []
+    if series_by_camera is None:
+        series_by_camera = {camera: _copy_camera(camera)[1] for camera in cameras}
+    if latest_data is None:
+        latest_data = {camera: _copy_camera(camera)[0] for camera in cameras}
+    status_frames = []
     for camera in cameras:
-        points = time_series_by_camera.get(camera, [])
-        for point in points:
-            timestamp, distance_mm, fps, people_count = point
-            iso_timestamp = datetime.fromtimestamp(timestamp).isoformat(timespec="seconds")
-            mode = latest_data_by_camera.get(camera, {}).get("mode", "")
-            zone = "SAFE" if (isinstance(distance_mm, (int, float)) and distance_mm >= safe_distance_mm) else "ALERT"
-            status_rows.append({
-                "time": iso_timestamp,
-                "camera_id": camera,
-                "mode": mode,
-                "distance_mm": distance_mm,
-                "fps": fps,
-                "count": people_count,
-                "zone": zone,
-            })
-    if not status_rows:
+        series = series_by_camera.get(camera)
+        if series is None or not series.shape[1]:
+            continue
+        timestamps, distance_mm, fps, people_count = series
+        status_frames.append(pd.DataFrame({
+            "time": _local_times(timestamps),
+            "camera_id": camera,
+            "mode": latest_data.get(camera, {}).get("mode", ""),
+            "distance_mm": distance_mm,
+            "fps": fps,
+            "count": people_count,
+            "zone": np.where(distance_mm >= safe_distance_mm, "SAFE", "ALERT"),
+        }))
+    if not status_frames:
         return pd.DataFrame(columns=["time","camera_id","mode","distance_mm","fps","count","zone"])
-    status_df = pd.DataFrame(status_rows)
+    status_df = pd.concat(status_frames, ignore_index=True)
     return status_df.sort_values(["time"], kind="stable").reset_index(drop=True)
 
-def _build_status_summary(cameras: list[str], safe_distance_mm: int) -> str:
+def _build_status_summary(cameras: list[str], safe_distance_mm: int, latest_data: dict | None = None) -> str:
     """
     Build a centred visual summary with classification, distance and count details.
     """
+    if latest_data is None:
+        latest_data = {camera: _copy_camera(camera)[0] for camera in cameras}
 
     def _metric_block(label: str, value: str, highlight: bool = True, extra_class: str = "") -> str:
         highlight_class = "metric-highlight" if highlight else ""
@@ -67,7 +105,7 @@ def _build_status_summary(cameras: list[str], safe_distance_mm: int) -> str:
 
     parts = ["<div class=\"status-summary-content\">"]
     for camera in cameras:
-        last_data = latest_data_by_camera.get(camera, {})
+        last_data = latest_data.get(camera, {})
         mode = last_data.get("mode", "tof")
         metrics_html: list[str] = []
 
@@ -98,11 +136,13 @@ def _build_status_summary(cameras: list[str], safe_distance_mm: int) -> str:
     parts.append("</div>")
     return "\n".join(parts)
 
-def _build_fomo_box(nicla2_cam_id: str) -> str:
+def _build_fomo_box(nicla2_cam_id: str, latest_data: dict | None = None) -> str:
     """
     Build the markdown used for the Nicla-02 FOMO box.
     """
-    latest_fomo = latest_data_by_camera.get(nicla2_cam_id, {})
+    if latest_data is None:
+        latest_data = {nicla2_cam_id: _copy_camera(nicla2_cam_id)[0]}
+    latest_fomo = latest_data.get(nicla2_cam_id, {})
     if latest_fomo.get("mode") == "fomo":
         lab = latest_fomo.get("fomo_label", "?")
         prb = latest_fomo.get("fomo_prob", 0.0)
@@ -112,121 +152,212 @@ def _build_fomo_box(nicla2_cam_id: str) -> str:
         fomo_md = "### 👁️‍🗨️ Nicla-02 FOMO\n_waiting for serial data..._"
     return fomo_md
 
-def _prepare_time_series_data(current_camera: str, safe_distance_mm: int, window_seconds: int) -> "pd.DataFrame":
+def _prepare_time_series_data(current_camera: str, safe_distance_mm: int, window_seconds: int,
+                              points: "np.ndarray | None" = None, max_points: int = 0,
+                              downsample: str = "minmax") -> "pd.DataFrame":
     """
     Prepare the time-series data for the distance chart.
-    Filter recent samples and colour points based on the SAFE/ALERT zone.
+    Filter recent samples, reduce them to at most max_points (0 = keep all) and colour
+    points based on the SAFE/ALERT zone.
+    points is the (4, n) window already copied from the ring buffer; when None it is read
+    from the camera shard.
     """
-    if current_camera and time_series_by_camera.get(current_camera):
+    if points is None and current_camera:
         cutoff_time = get_current_timestamp() - window_seconds
-        points = [point for point in time_series_by_camera[current_camera] if point[0] >= cutoff_time]
-        if points:
-            df = pd.DataFrame(points, columns=["timestamp", "distance_mm", "fps", "people_count"])
-            df["Time"] = pd.to_datetime(df["timestamp"], unit="s")
-            df.sort_values("Time", inplace=True)
-            df["Distance (mm)"] = pd.to_numeric(df["distance_mm"], errors="coerce")
+        points = _copy_camera(current_camera, series=False, window_start=cutoff_time)[2]
+    if points is not None and points.shape[1]:
+        timestamps, distances = points[0], points[1]
+        if np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, distances = timestamps[order], distances[order]
+        keep = downsample_indices(timestamps, distances, max_points, downsample)
+        timestamps, distances = timestamps[keep], distances[keep]
+        return pd.DataFrame({
+            "Time": pd.to_datetime(timestamps, unit="s"),
+            "Distance (mm)": distances,
             # Colour the points: green for SAFE, red for ALERT
-            df["color"] = df["Distance (mm)"].apply(lambda x: "green" if x >= safe_distance_mm else "red")
-            return df[["Time", "Distance (mm)", "color"]].copy()
+            "color": np.where(distances >= safe_distance_mm, "green", "red"),
+        })
     return create_empty_time_series_dataframe()
 
-def _create_distance_plot(distance_df: "pd.DataFrame", safe_distance_mm: int) -> "px.Figure":
+# Map colours for SAFE and ALERT
+DISTANCE_COLOR_MAP = {
+    "SAFE": "#2ca02c",  # green for SAFE
+    "ALERT": "#d62728"  # red for ALERT
+}
+# Layout shared by every distance figure, built once (title, axes, legend)
+_distance_layout: "go.Layout | None" = None
+
+def _get_distance_layout() -> "go.Layout":
+    """
+    Return the shared layout of the distance chart, building it on first use.
+    """
+    global _distance_layout
+    if _distance_layout is None:
+        _distance_layout = go.Layout(
+            title="Distance (ToF) — Last Few Minutes",
+            xaxis=dict(title="Time"),
+            yaxis=dict(title="Distance (mm)"),
+            legend=dict(title="color"),
+        )
+    return _distance_layout
+
+def _create_distance_plot(distance_df: "pd.DataFrame", safe_distance_mm: int) -> "go.Figure":
     """
     Create the Plotly distance-over-time chart.
     Include SAFE/ALERT colours and a background rectangle.
+    Built directly from graph objects on the shared layout (no plotly.express grouping per tick).
     """
     if distance_df.empty:
         return None
 
-    # Map colours for SAFE and ALERT
-    color_discrete_map = {
-        "SAFE": "#2ca02c",  # green for SAFE
-        "ALERT": "#d62728"  # red for ALERT
-    }
-    # Convert colour names into chart labels
-    distance_df["color"] = distance_df["color"].map({"green": "SAFE", "red": "ALERT"})
+    times = distance_df["Time"].to_numpy()
+    distances = distance_df["Distance (mm)"].to_numpy(dtype=float)
+    is_safe = distance_df["color"].to_numpy() == "green"
 
     # Compute margins for the background rectangle
-    safe_vals = distance_df[distance_df["color"] == "SAFE"]["Distance (mm)"]
-    alert_vals = distance_df[distance_df["color"] == "ALERT"]["Distance (mm)"]
-    if not safe_vals.empty and not alert_vals.empty:
-        safe_min = safe_vals.min()
-        alert_max = alert_vals.max()
+    safe_vals = distances[is_safe]
+    alert_vals = distances[~is_safe]
+    if safe_vals.size and alert_vals.size:
+        safe_min = np.nanmin(safe_vals)
+        alert_max = np.nanmax(alert_vals)
         margin = max((alert_max - safe_min) / 2, 10)  # minimum margin of 10
         lower_bound = safe_min - margin
         upper_bound = alert_max + margin
     else:
         lower_bound = safe_distance_mm - 10
         upper_bound = safe_distance_mm + 10
-
-    # Create the coloured scatter plot
     lower_bound, upper_bound = sorted((lower_bound, upper_bound))
-    fig = px.scatter(distance_df, x="Time", y="Distance (mm)", color="color", title="Distance (ToF) — Last Few Minutes",
-                     color_discrete_map=color_discrete_map)
-    fig.update_traces(showlegend=False)  # Remove duplicate legend entries
 
+    fig = go.Figure(layout=_get_distance_layout())
     # Add a light-green background rectangle
     fig.add_hrect(y0=lower_bound, y1=upper_bound, fillcolor="#98fb98", opacity=0.3, line_width=0)
     # Connect SAFE points with lines and plot ALERT points as markers
-    safe_df = distance_df[distance_df["color"] == "SAFE"]
-    alert_df = distance_df[distance_df["color"] == "ALERT"]
-    fig.add_scatter(x=safe_df["Time"], y=safe_df["Distance (mm)"], mode="lines+markers", name="SAFE", line=dict(color=color_discrete_map["SAFE"]))
-    fig.add_scatter(x=alert_df["Time"], y=alert_df["Distance (mm)"], mode="markers", name="ALERT", marker=dict(color=color_discrete_map["ALERT"]))
+    fig.add_trace(go.Scatter(x=times[is_safe], y=safe_vals, mode="lines+markers", name="SAFE",
+                             line=dict(color=DISTANCE_COLOR_MAP["SAFE"])))
+    fig.add_trace(go.Scatter(x=times[~is_safe], y=alert_vals, mode="markers", name="ALERT",
+                             marker=dict(color=DISTANCE_COLOR_MAP["ALERT"])))
     return fig
 
-def snapshot_state(selected_camera: str, safe_distance_mm: int, window_seconds: int, max_events_in_table: int, nicla2_cam_id: str = "nicla-02"):
+def _build_dropdown_update(cameras: list[str], selected_camera: str, current_camera: str | None):
+    """
+    Build the camera dropdown update.
+    """
+    choices = cameras.copy()
+    if selected_camera and selected_camera not in choices:
+        logger.warning(f"Selected camera {selected_camera} not in the available choices, adding it.")
+        choices.append(selected_camera)
+    return gr.update(choices=choices, value=current_camera)
+
+def snapshot_state(selected_camera: str, safe_distance_mm: int, window_seconds: int, max_events_in_table: int,
+                   nicla2_cam_id: str = "nicla-02", render_state: dict | None = None,
+                   plot_max_points: int = 1500, plot_downsample: str = "minmax"):
     """
     Main function that updates the dashboard state.
     Coordinate data collection and prepare UI updates.
     Invoked every second by the Gradio timer for real-time refreshes.
-    """
-    with data_lock:
-        cameras = sorted(latest_data_by_camera.keys())
-        logger.debug(f"Available cameras: {cameras}")
-        current_camera = selected_camera if (selected_camera and selected_camera in cameras) else (cameras[0] if cameras else None)
-        logger.debug(f"Selected camera: {selected_camera}, Active camera used: {current_camera}")
 
-        # Build the textual status summary
-        summary = _build_status_summary(cameras, safe_distance_mm)
+    Every panel has a key built from the per-camera version counters and the inputs it
+    depends on. render_state (a per-session gr.State) remembers the key each panel was
+    last sent with: unchanged panels get gr.update() and are skipped, changed ones are
+    rebuilt (or reused from _panel_cache when another session already built them).
+    Each camera is copied under its own shard lock, so the snapshot is consistent per
+    camera and never blocks ingestion of the other cameras. Only the data needed for the
+    rebuilt panels is copied; the DataFrames, HTML and figure are built without any lock.
+    """
+    render_state = dict(render_state or {})
+    now = get_current_timestamp()
 
-        # Prepare the camera dropdown update
-        choices = cameras.copy()
-        if selected_camera and selected_camera not in choices:
-            logger.warning(f"Selected camera {selected_camera} not in the available choices, adding it.")
-            choices.append(selected_camera)
-        dropdown_update = gr.update(choices=choices, value=current_camera)
+    cameras = list_cameras()
+    logger.debug(f"Available cameras: {cameras}")
+    current_camera = selected_camera if (selected_camera and selected_camera in cameras) else (cameras[0] if cameras else None)
+    logger.debug(f"Selected camera: {selected_camera}, Active camera used: {current_camera}")
 
-        # Build the camera status table
-        status_df = build_status_dataframe(cameras, safe_distance_mm)
+    # Version counters are plain ints; a stale read only delays the refresh by one tick
+    versions = {camera: shard.version for camera, shard in list(camera_shards.items())}
+    camera_versions = tuple((camera, versions.get(camera, 0)) for camera in cameras)
+    current_version = versions.get(current_camera, 0) if current_camera else 0
+    keys = {
+        "summary": (camera_versions, safe_distance_mm),
+        "status": (camera_versions, safe_distance_mm),
+        "plot": (current_camera, current_version, safe_distance_mm, window_seconds, plot_max_points, plot_downsample,
+                 int(now // PLOT_WINDOW_REFRESH_SECONDS)),
+        "events": (get_event_log_version(), max_events_in_table),
+        "debug": (current_camera, current_version),
+        "dropdown": (tuple(cameras), selected_camera, current_camera),
+        "fomo": (nicla2_cam_id, versions.get(nicla2_cam_id, 0)),
+    }
+    # Panels that this session has not seen yet and no other session has built
+    stale = {name for name, key in keys.items()
+             if render_state.get(name) != key and _panel_cache.get(name, (None,))[0] != key}
 
-        # Prepare the data for the time-series chart
-        distance_df = _prepare_time_series_data(current_camera, safe_distance_mm, window_seconds)
+    # Copy just enough state for the stale panels, one shard at a time
+    need_latest = bool(stale & {"summary", "status", "debug", "fomo"})
+    need_series = "status" in stale
+    latest_data = {}
+    series_by_camera = {} if need_series else None
+    plot_points = None
+    for camera in set(cameras) | ({nicla2_cam_id} if "fomo" in stale else set()):
+        window_start = now - window_seconds if ("plot" in stale and camera == current_camera) else None
+        if not (need_latest or need_series or window_start is not None):
+            continue
+        latest, series, window, _ = _copy_camera(camera, need_latest, need_series, window_start)
+        if need_latest:
+            latest_data[camera] = latest
+        if need_series:
+            series_by_camera[camera] = series
+        if window_start is not None:
+            plot_points = window
 
+    builders = {
+        # Build the textual status summary
+        "summary": lambda: _build_status_summary(cameras, safe_distance_mm, latest_data),
+        # Build the camera status table
+        "status": lambda: build_status_dataframe(cameras, safe_distance_mm, series_by_camera, latest_data),
+        # Prepare the time-series data and create the Plotly figure
+        "plot": lambda: _create_distance_plot(
+            _prepare_time_series_data(current_camera, safe_distance_mm, window_seconds,
+                                      plot_points if plot_points is not None else np.empty((4, 0)),
+                                      plot_max_points, plot_downsample),
+            safe_distance_mm),
         # Prepare the alarm event table
-        event_list = list(event_log)
-        if max_events_in_table > 0:
-            event_list = event_list[-max_events_in_table:]
-        events_df = to_events_dataframe(event_list)
-
+        # Only the displayed rows are materialised, straight from the lock-free event store
+        "events": lambda: to_events_dataframe(limit=max_events_in_table),
         # Fetch the last packet received for debugging
-        last_debug = latest_data_by_camera.get(current_camera, {}) if current_camera else {}
-
+        "debug": lambda: latest_data.get(current_camera, {}) if current_camera else {},
+        # Prepare the camera dropdown update
+        "dropdown": lambda: _build_dropdown_update(cameras, selected_camera, current_camera),
         # Build the FOMO box content
-        fomo_md = _build_fomo_box(nicla2_cam_id)
+        "fomo": lambda: _build_fomo_box(nicla2_cam_id, latest_data),
+    }
 
-    # Create the Plotly figure using the prepared data
-    fig = _create_distance_plot(distance_df, safe_distance_mm)
+    outputs = {}
+    for name, key in keys.items():
+        if render_state.get(name) == key:
+            outputs[name] = gr.update()  # unchanged for this session
+            continue
+        cached = _panel_cache.get(name)
+        if cached is not None and cached[0] == key:
+            outputs[name] = cached[1]
+        elif name in stale:
+            outputs[name] = builders[name]()
+            _panel_cache[name] = (key, outputs[name])
+        else:
+            # Another session replaced the cached value after the keys were computed; retry next tick
+            outputs[name] = gr.update()
+            continue
+        render_state[name] = key
 
     # Return every update intended for the user interface
-    return [summary, status_df, fig, events_df, last_debug, dropdown_update, fomo_md]
+    return [outputs["summary"], outputs["status"], outputs["plot"], outputs["events"], outputs["debug"],
+            outputs["dropdown"], outputs["fomo"], render_state]
 
 # def clear_events_handler():
 #     """
 #     Handle clearing the events.
 #     Reset the events table, plot and dropdown.
 #     """
-#     with data_lock:
-#         cleared_events_df = clear_events_dataframe()
+#     cleared_events_df = clear_events_dataframe()
 #     empty_fig = None
 #     empty_dropdown_update = gr.update(choices=[], value=None)
 #     return [cleared_events_df, empty_fig, empty_dropdown_update]
@@ -0,0 +1,96 @@
+"""
+Property test: process_alert_batch must produce the same events and final alarm
+state as calling process_alert once per sample.
+"""
+from __future__ import annotations
+import math
+import os
+import random
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "dashboard"))
+from core import alerts
+from core.state import get_camera_shard
+
+SAFE_DISTANCE_MM = 1000
+HYSTERESIS_MM = 100
+INITIAL_STATES = [
+    {"in_alert": in_alert, "t_start": t_start, "last_change": last_change}
+    for in_alert in (False, True)
+    for t_start in (None, 5.0)
+    for last_change in (None, 0.0, 3.0, 1e9)
+]
+
+def _random_sequence(rng: random.Random) -> tuple[list[float], list[float]]:
+    """
+    Random samples around the thresholds, with NaN distances, optionally unsorted
+    timestamps and optionally absolute (epoch-like) timestamps.
+    """
+    n = rng.randint(0, 80)
+    timestamps = [rng.uniform(0, 30) for _ in range(n)]
+    if rng.random() < 0.7:
+        timestamps.sort()
+    if rng.random() < 0.3:
+        timestamps = [t + 1e9 for t in timestamps]
+    distances = [float("nan") if rng.random() < 0.05 else rng.uniform(700, 1300) for _ in range(n)]
+    return timestamps, distances
+
+def _same_value(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+def _normalise(events: list) -> list:
+    # NaN never equals itself, so compare payload values one by one
+    return [(event_type, {key: ("nan" if _same_value(value, float("nan")) else value) for key, value in payload.items()})
+            for event_type, payload in events]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_batch_matches_scalar(monkeypatch, seed):
+    rng = random.Random(seed)
+    emitted = {"scalar": [], "batch": []}
+    current = {"mode": "scalar"}
+    monkeypatch.setattr(alerts, "push_event",
+                        lambda event_type, camera_id, payload: emitted[current["mode"]].append((event_type, dict(payload))))
+
+    for case in range(250):
+        timestamps, distances = _random_sequence(rng)
+        min_dwell_seconds = rng.choice([0.0, 0.5, 2.0, -1.0])
+        initial_state = rng.choice(INITIAL_STATES)
+        scalar_shard = get_camera_shard("scalar")
+        batch_shard = get_camera_shard("batch")
+        scalar_shard.alert_state = dict(initial_state)
+        batch_shard.alert_state = dict(initial_state)
+        emitted["scalar"].clear()
+        emitted["batch"].clear()
+
+        current["mode"] = "scalar"
+        for timestamp, distance in zip(timestamps, distances):
+            alerts.process_alert(scalar_shard.camera_id, distance, timestamp,
+                                 SAFE_DISTANCE_MM, HYSTERESIS_MM, min_dwell_seconds)
+
+        # Random sub-batches check that the state carries over between calls
+        current["mode"] = "batch"
+        start = 0
+        while start < len(timestamps):
+            end = start + rng.randint(1, 20)
+            alerts.process_alert_batch(batch_shard.camera_id, timestamps[start:end], distances[start:end],
+                                       SAFE_DISTANCE_MM, HYSTERESIS_MM, min_dwell_seconds)
+            start = end
+
+        assert _normalise(emitted["batch"]) == _normalise(emitted["scalar"])
+        assert batch_shard.alert_state == scalar_shard.alert_state
+
+def test_batch_reports_transition_indexes(monkeypatch):
+    monkeypatch.setattr(alerts, "push_event", lambda *args: None)
+    shard = get_camera_shard("transitions")
+    shard.alert_state = {"in_alert": False, "t_start": None, "last_change": 1.0}
+    transitions = alerts.process_alert_batch(shard.camera_id, [10.0, 11.0, 12.0, 13.0], [1200.0, 800.0, 950.0, 1200.0],
+                                             SAFE_DISTANCE_MM, HYSTERESIS_MM, 0.5)
+    assert transitions == [(1, "ALERT_ENTER"), (3, "ALERT_EXIT")]
+    assert shard.alert_state == {"in_alert": False, "t_start": 11.0, "last_change": 13.0}
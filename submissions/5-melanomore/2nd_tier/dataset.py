@@ -2,8 +2,9 @@
 Data loading and preprocessing for skin cancer classification
 """
 import os
+import json
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, Sampler
 from torchvision import transforms
 from PIL import Image
 import albumentations as A
@@ -54,6 +55,191 @@ class SkinCancerDataset(Dataset):
         return image, label
 
 
+class ResumableSampler(Sampler):
+    """
+    Epoch-seeded random sampler that can resume in the middle of an epoch
+
+    The order of each epoch is a pure function of (seed, epoch), so restoring
+    the epoch and the number of already consumed samples reproduces the rest
+    of an interrupted epoch exactly. With balanced=True, samples are drawn with
+    replacement with probability inversely proportional to their class frequency.
+    """
+
+    def __init__(self, labels, seed=0, balanced=False):
+        """
+        Args:
+            labels: Class index of every sample in the dataset
+            seed: Base random seed
+            balanced: Draw class-balanced samples (with replacement)
+        """
+        self.num_samples = len(labels)
+        self.seed = seed
+        self.balanced = balanced
+        self.epoch = 0
+        self.start_index = 0
+
+        labels = torch.as_tensor(labels, dtype=torch.long)
+        class_counts = torch.bincount(labels).double()
+        self.weights = (1.0 / class_counts)[labels]
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+        self.start_index = 0
+
+    def set_start_index(self, start_index):
+        """Skip the first start_index samples of the current epoch"""
+        self.start_index = start_index
+
+    def __iter__(self):
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+
+        if self.balanced:
+            indices = torch.multinomial(self.weights, self.num_samples, replacement=True,
+                                        generator=generator)
+        else:
+            indices = torch.randperm(self.num_samples, generator=generator)
+
+        start_index = self.start_index
+        self.start_index = 0
+        return iter(indices[start_index:].tolist())
+
+    def __len__(self):
+        return self.num_samples - self.start_index
+
+    def state_dict(self):
+        return {
+            'seed': self.seed,
+            'balanced': self.balanced,
+            'epoch': self.epoch,
+            'start_index': self.start_index,
+        }
+
+    def load_state_dict(self, state):
+        self.seed = state['seed']
+        self.balanced = state['balanced']
+        self.epoch = state['epoch']
+        self.start_index = state['start_index']
+
+
+class ImagePathDataset(Dataset):
+    """Unlabelled dataset over an explicit list of image paths (for batch prediction)"""
+
+    def __init__(self, image_paths, transform=None):
+        """
+        Args:
+            image_paths: List of image file paths
+            transform: Albumentations transform to apply
+        """
+        self.image_paths = list(image_paths)
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        img_path = self.image_paths[idx]
+
+        image = Image.open(img_path).convert('RGB')
+        image = np.array(image)
+
+        if self.transform:
+            transformed = self.transform(image=image)
+            image = transformed['image']
+
+        return image, idx
+
+
+def list_image_files(path_or_glob):
+    """
+    Resolve a folder or glob pattern to a sorted list of image files
+
+    Args:
+        path_or_glob: Directory (searched recursively) or glob pattern
+    """
+    import glob
+
+    if os.path.isdir(path_or_glob):
+        pattern = os.path.join(path_or_glob, '**', '*')
+    else:
+        pattern = path_or_glob
+
+    return sorted(
+        path for path in glob.glob(pattern, recursive=True)
+        if os.path.isfile(path) and path.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+
+
+INDEX_FILENAME = '.dataset_index.json'
+
+
+def build_dataset_index(root_dir, split='train', use_cache=True):
+    """
+    Lightweight index of a split: class names, file lists, class counts and image sizes
+
+    Only image headers are read (no decoding, no transforms). The index is cached
+    as JSON inside the split directory and rebuilt when any class directory's
+    mtime changes.
+
+    Args:
+        root_dir: Root directory containing train/valid/test folders
+        split: 'train', 'valid', or 'test'
+        use_cache: Read/write the cached index
+
+    Returns:
+        dict with 'classes', 'files' (class -> relative paths), 'class_counts'
+        (class -> count), 'image_sizes' (relative path -> [width, height])
+        and 'split_dir'
+    """
+    split_dir = os.path.join(root_dir, split)
+    cache_path = os.path.join(split_dir, INDEX_FILENAME)
+
+    classes = sorted([d for d in os.listdir(split_dir)
+                      if os.path.isdir(os.path.join(split_dir, d))])
+    dir_mtimes = {cls: os.stat(os.path.join(split_dir, cls)).st_mtime for cls in classes}
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                index = json.load(f)
+            if index.get('dir_mtimes') == dir_mtimes:
+                index['split_dir'] = split_dir
+                return index
+        except (OSError, ValueError):
+            pass
+
+    files = {}
+    image_sizes = {}
+    for class_name in classes:
+        class_dir = os.path.join(split_dir, class_name)
+        names = sorted(img_name for img_name in os.listdir(class_dir)
+                       if img_name.lower().endswith(('.jpg', '.jpeg', '.png')))
+        files[class_name] = [os.path.join(class_name, img_name) for img_name in names]
+
+        for rel_path in files[class_name]:
+            # Image.open only parses the header
+            with Image.open(os.path.join(split_dir, rel_path)) as img:
+                image_sizes[rel_path] = list(img.size)
+
+    index = {
+        'classes': classes,
+        'files': files,
+        'class_counts': {cls: len(paths) for cls, paths in files.items()},
+        'image_sizes': image_sizes,
+        'dir_mtimes': dir_mtimes,
+    }
+
+    if use_cache:
+        try:
+            with open(cache_path, 'w') as f:
+                json.dump(index, f)
+        except OSError:
+            pass
+
+    index['split_dir'] = split_dir
+    return index
+
+
 def get_transforms(img_size=384, split='train'):
     """
     Get albumentations transforms for different splits
@@ -102,7 +288,8 @@ def get_transforms(img_size=384, split='train'):
         ])
 
 
-def create_dataloaders(root_dir, batch_size=32, img_size=384, num_workers=4):
+def create_dataloaders(root_dir, batch_size=32, img_size=384, num_workers=4,
+                       balanced_sampling=False, seed=0):
     """
     Create train, validation, and test dataloaders
 
@@ -111,6 +298,8 @@ def create_dataloaders(root_dir, batch_size=32, img_size=384, num_workers=4):
         batch_size: Batch size for training
         img_size: Image size for model input
         num_workers: Number of workers for data loading
+        balanced_sampling: Sample training images inversely to their class frequency
+        seed: Seed of the training sampler
 
     Returns:
         train_loader, val_loader, test_loader, num_classes, class_names
@@ -137,10 +326,16 @@ def create_dataloaders(root_dir, batch_size=32, img_size=384, num_workers=4):
     )
 
     # Create dataloaders
+    train_sampler = ResumableSampler(
+        [label for _, label in train_dataset.samples],
+        seed=seed,
+        balanced=balanced_sampling
+    )
+
     train_loader = DataLoader(
         train_dataset,
         batch_size=batch_size,
-        shuffle=True,
+        sampler=train_sampler,
         num_workers=num_workers,
         pin_memory=True,
         persistent_workers=True if num_workers > 0 else False
@@ -0,0 +1,234 @@
+"""
+Knowledge distillation from the 2nd-tier ViT teacher to a Nicla-sized student
+Teacher logits are computed once and cached; the student is exported to ONNX and quantized
+"""
+import os
+import torch
+import torch.nn as nn
+from torch.amp import autocast
+from torch.utils.data import Dataset, DataLoader
+from tqdm import tqdm
+
+from dataset import SkinCancerDataset, get_transforms
+from model import create_model
+
+
+class IndexedDataset(Dataset):
+    """Wraps a dataset so that each item also returns its index"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.classes = dataset.classes
+        self.samples = dataset.samples
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, idx):
+        image, label = self.dataset[idx]
+        return image, label, idx
+
+
+class DistillationLoss(nn.Module):
+    """
+    Hinton et al. knowledge distillation loss
+    https://arxiv.org/abs/1503.02531
+
+    alpha * T^2 * KL(softmax(teacher / T) || softmax(student / T)) + (1 - alpha) * hard loss
+    """
+
+    def __init__(self, hard_criterion, temperature=4.0, alpha=0.7):
+        super(DistillationLoss, self).__init__()
+        self.hard_criterion = hard_criterion
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, student_logits, teacher_logits, targets):
+        student_logits = student_logits.float()
+        teacher_logits = teacher_logits.float()
+        T = self.temperature
+
+        soft_loss = nn.functional.kl_div(
+            nn.functional.log_softmax(student_logits / T, dim=1),
+            nn.functional.softmax(teacher_logits / T, dim=1),
+            reduction='batchmean'
+        ) * (T * T)
+        hard_loss = self.hard_criterion(student_logits, targets)
+
+        return self.alpha * soft_loss + (1.0 - self.alpha) * hard_loss
+
+
+def load_teacher(checkpoint_path, num_classes, device):
+    """
+    Load a trained teacher from a train.py checkpoint
+
+    Returns:
+        teacher model (eval mode), teacher image size
+    """
+    checkpoint = torch.load(checkpoint_path, map_location=device, weights_only=False)
+    saved_args = checkpoint['args']
+
+    teacher = create_model(
+        model_name=saved_args.model_name,
+        num_classes=num_classes,
+        pretrained=False,
+        dropout=saved_args.dropout
+    )
+    teacher.load_state_dict(checkpoint['model_state_dict'])
+    teacher = teacher.to(device)
+    teacher.eval()
+
+    return teacher, saved_args.img_size
+
+
+@torch.no_grad()
+def compute_teacher_logits(teacher, data_dir, img_size, device, batch_size=32, num_workers=4):
+    """
+    Run the teacher once over the (non-augmented) training split
+
+    Returns:
+        dict with 'paths' (sample paths) and 'logits' (float32 tensor of shape (N, num_classes))
+    """
+    dataset = SkinCancerDataset(data_dir, split='train', transform=get_transforms(img_size, 'test'))
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        pin_memory=True
+    )
+
+    all_logits = []
+    for images, _ in tqdm(loader, desc='Teacher logits'):
+        images = images.to(device, non_blocking=True)
+        with autocast('cuda'):
+            outputs = teacher(images)
+        all_logits.append(outputs.float().cpu())
+
+    return {
+        'paths': [path for path, _ in dataset.samples],
+        'logits': torch.cat(all_logits, dim=0),
+    }
+
+
+def checkpoint_fingerprint(path):
+    """Identify a checkpoint file by absolute path, size and modification time"""
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_or_compute_teacher_logits(cache_path, teacher_checkpoint, data_dir, num_classes, device,
+                                   batch_size=32, num_workers=4):
+    """
+    Return cached teacher logits, computing and saving them on the first call
+    The teacher is only loaded when the cache is missing or stale: the cache is reused
+    only if the checkpoint has the same path, size and modification time, so retraining
+    the teacher in place invalidates it.
+    """
+    fingerprint = checkpoint_fingerprint(teacher_checkpoint)
+    if os.path.exists(cache_path):
+        cache = torch.load(cache_path, weights_only=False)
+        if cache.get('teacher_fingerprint') == fingerprint:
+            print(f"Loaded cached teacher logits from {cache_path}")
+            return cache
+        print(f"Teacher logits cache {cache_path} is for another or a modified checkpoint, recomputing")
+
+    print(f"Loading teacher from {teacher_checkpoint}")
+    teacher, teacher_img_size = load_teacher(teacher_checkpoint, num_classes, device)
+
+    cache = compute_teacher_logits(
+        teacher, data_dir, teacher_img_size, device,
+        batch_size=batch_size, num_workers=num_workers
+    )
+    cache['teacher_checkpoint'] = fingerprint['path']
+    cache['teacher_fingerprint'] = fingerprint
+
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    torch.save(cache, cache_path)
+    print(f"Saved teacher logits to {cache_path}")
+
+    # Free the teacher before training the student
+    del teacher
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+    return cache
+
+
+def align_teacher_logits(cache, samples):
+    """
+    Reorder cached logits to match a dataset's sample order
+
+    Returns:
+        float32 tensor of shape (len(samples), num_classes)
+    """
+    row_by_path = {path: row for row, path in enumerate(cache['paths'])}
+    missing = [path for path, _ in samples if path not in row_by_path]
+    if missing:
+        raise ValueError(f"{len(missing)} training images have no cached teacher logits "
+                         f"(e.g. {missing[0]}); delete the cache to recompute it")
+
+    rows = torch.tensor([row_by_path[path] for path, _ in samples], dtype=torch.long)
+    return cache['logits'][rows]
+
+
+def export_onnx(model, onnx_path, img_size, opset=13):
+    """Export a model to ONNX with a fixed 1x3xHxW input"""
+    model = model.cpu().eval()
+    dummy_input = torch.randn(1, 3, img_size, img_size)
+
+    torch.onnx.export(
+        model,
+        dummy_input,
+        onnx_path,
+        input_names=['input'],
+        output_names=['logits'],
+        opset_version=opset,
+        do_constant_folding=True
+    )
+    print(f"Exported ONNX model to {onnx_path}")
+
+
+def quantize_onnx(onnx_path, quantized_path, calibration_loader, num_batches=32):
+    """
+    Statically quantize an ONNX model to int8 using calibration images
+
+    Args:
+        onnx_path: Float ONNX model
+        quantized_path: Output path for the quantized model
+        calibration_loader: DataLoader yielding (images, labels, ...) with test transforms
+        num_batches: Number of calibration batches
+    """
+    try:
+        from onnxruntime.quantization import (
+            CalibrationDataReader, QuantFormat, QuantType, quantize_static
+        )
+    except ImportError as exc:
+        raise RuntimeError("onnxruntime is required for quantization: pip install onnxruntime") from exc
+
+    class _LoaderDataReader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = self._iter_batches()
+
+        def _iter_batches(self):
+            for batch_idx, batch in enumerate(calibration_loader):
+                if batch_idx >= num_batches:
+                    break
+                # Exported model has a batch size of 1
+                for image in batch[0]:
+                    yield {'input': image.unsqueeze(0).numpy()}
+
+        def get_next(self):
+            return next(self.batches, None)
+
+    quantize_static(
+        onnx_path,
+        quantized_path,
+        _LoaderDataReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QInt8,
+        weight_type=QuantType.QInt8
+    )
+    print(f"Saved quantized model to {quantized_path}")
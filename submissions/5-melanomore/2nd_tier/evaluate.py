@@ -2,15 +2,19 @@
 Evaluation and inference script for skin cancer classification
 """
 import os
+import csv
+import json
+import time
 import argparse
 import torch
+from torch.utils.data import DataLoader
 from torch.amp import autocast
 from tqdm import tqdm
 import numpy as np
 from PIL import Image
 
-from dataset import create_dataloaders, get_transforms
-from model import create_model
+from dataset import create_dataloaders, get_transforms, ImagePathDataset, list_image_files
+from model import create_model, create_student_model, TTAModel
 from metrics import MetricsCalculator, print_metrics_summary
 
 
@@ -94,6 +98,79 @@ def predict_single_image(model, image_path, transform, device, class_names):
     return predicted_class, probabilities, predicted_idx
 
 
+@torch.no_grad()
+def predict_folder(model, image_paths, transform, device, class_names, output_path,
+                   batch_size=32, num_workers=4):
+    """
+    Predict the class of many images, streaming results to CSV or JSONL
+
+    Args:
+        model: The model to use
+        image_paths: List of image paths
+        transform: Transform to apply to each image
+        device: Device to use
+        class_names: List of class names
+        output_path: Output file (.csv or .jsonl), written as batches complete
+        batch_size: Batch size for inference
+        num_workers: Number of data loading workers
+
+    Returns:
+        num_images, elapsed_seconds
+    """
+    model.eval()
+
+    dataset = ImagePathDataset(image_paths, transform=transform)
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        num_workers=num_workers,
+        pin_memory=True
+    )
+
+    as_csv = output_path.lower().endswith('.csv')
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    num_images = 0
+    start_time = time.perf_counter()
+
+    with open(output_path, 'w', newline='') as f:
+        if as_csv:
+            writer = csv.writer(f)
+            writer.writerow(['image_path', 'predicted_class', 'confidence'] + list(class_names))
+
+        pbar = tqdm(loader, desc='Predicting')
+        for images, indices in pbar:
+            images = images.to(device, non_blocking=True)
+
+            with autocast('cuda'):
+                outputs = model(images)
+            probs = torch.softmax(outputs.float(), dim=1).cpu().numpy()
+            preds = probs.argmax(axis=1)
+
+            for idx, pred, prob in zip(indices.tolist(), preds, probs):
+                image_path = dataset.image_paths[idx]
+                if as_csv:
+                    writer.writerow([image_path, class_names[pred], f'{prob[pred]:.6f}']
+                                    + [f'{p:.6f}' for p in prob])
+                else:
+                    f.write(json.dumps({
+                        'image_path': image_path,
+                        'predicted_class': class_names[pred],
+                        'confidence': float(prob[pred]),
+                        'probabilities': {name: float(p) for name, p in zip(class_names, prob)},
+                    }) + '\n')
+            f.flush()
+
+            num_images += len(indices)
+            elapsed = time.perf_counter() - start_time
+            pbar.set_postfix({'img/s': f'{num_images / max(elapsed, 1e-9):.1f}'})
+
+    return num_images, time.perf_counter() - start_time
+
+
 def main(args):
     # Device configuration
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -139,8 +216,8 @@ def main(args):
 
         print(f"Evaluating on {args.split} set ({len(data_loader.dataset)} samples)")
 
-    # Single image mode
-    elif args.mode == 'single':
+    # Single image / folder mode
+    else:
         # Need to get class names somehow
         # Load from a small sample of the dataset
         _, _, _, num_classes, class_names = create_dataloaders(
@@ -152,7 +229,9 @@ def main(args):
 
     # Create model
     print(f"\nCreating model...")
-    model = create_model(
+    # Distilled students are plain timm models without the MLP head
+    model_factory = create_student_model if getattr(saved_args, 'distill', False) else create_model
+    model = model_factory(
         model_name=model_name,
         num_classes=num_classes if args.mode == 'dataset' else len(class_names),
         pretrained=False,  # We're loading trained weights
@@ -161,6 +240,9 @@ def main(args):
 
     # Load model weights
     model.load_state_dict(checkpoint['model_state_dict'])
+    if args.tta:
+        print(f"Test-time augmentation enabled ({TTAModel.NUM_VIEWS} dihedral views per image)")
+        model = TTAModel(model)
     model = model.to(device)
     model.eval()
 
@@ -231,14 +313,43 @@ def main(args):
 
         print("=" * 80)
 
+    # Folder / glob prediction
+    elif args.mode == 'folder':
+        if not args.image_dir:
+            raise ValueError("--image_dir is required for folder mode")
+
+        image_paths = list_image_files(args.image_dir)
+        if not image_paths:
+            raise ValueError(f"No images found in {args.image_dir}")
+
+        output_file = args.output_file
+        if output_file is None:
+            output_file = os.path.join(args.output_dir or '.', 'predictions.csv')
+
+        print(f"\nPredicting {len(image_paths)} images from: {args.image_dir}")
+        print(f"Streaming results to: {output_file}")
+
+        transform = get_transforms(img_size=img_size, split='test')
+
+        num_images, elapsed = predict_folder(
+            model, image_paths, transform, device, class_names, output_file,
+            batch_size=args.batch_size,
+            num_workers=args.num_workers
+        )
+
+        print("\n" + "=" * 80)
+        print(f"Predicted {num_images} images in {elapsed:.2f}s "
+              f"({num_images / max(elapsed, 1e-9):.1f} images/s)")
+        print("=" * 80)
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Evaluate skin cancer classification model')
 
     # Mode
     parser.add_argument('--mode', type=str, default='dataset',
-                        choices=['dataset', 'single'],
-                        help='Evaluation mode: dataset or single image')
+                        choices=['dataset', 'single', 'folder'],
+                        help='Evaluation mode: dataset, single image or folder/glob of images')
 
     # Checkpoint
     parser.add_argument('--checkpoint', type=str, required=True,
@@ -259,6 +370,12 @@ if __name__ == '__main__':
     parser.add_argument('--image_path', type=str, default=None,
                         help='Path to single image for prediction')
 
+    # Folder prediction parameters
+    parser.add_argument('--image_dir', type=str, default=None,
+                        help='Folder (searched recursively) or glob pattern of images to predict')
+    parser.add_argument('--output_file', type=str, default=None,
+                        help='Predictions file for folder mode (.csv or .jsonl)')
+
     # Model parameters (fallback if not in checkpoint)
     parser.add_argument('--model_name', type=str, default='vit_large_patch16_384',
                         help='Model architecture (fallback)')
@@ -267,6 +384,10 @@ if __name__ == '__main__':
     parser.add_argument('--dropout', type=float, default=0.3,
                         help='Dropout rate (fallback)')
 
+    # Test-time augmentation
+    parser.add_argument('--tta', action='store_true',
+                        help='Average logits over the 8 dihedral views (effective batch is 8x --batch_size)')
+
     # Output
     parser.add_argument('--output_dir', type=str, default=None,
                         help='Directory to save evaluation results')
@@ -122,6 +122,41 @@ def create_model(
     return model
 
 
+def create_student_model(
+    model_name: str = 'mobilenetv3_small_100',
+    num_classes: int = 7,
+    pretrained: bool = True,
+    dropout: float = 0.2
+) -> nn.Module:
+    """
+    Factory function for a compact student model small enough for the Nicla Vision
+
+    Unlike SkinCancerClassifier, the student keeps the backbone's own linear head:
+    the 1024/512 MLP head alone would not fit in the microcontroller's flash.
+
+    Recommended models:
+        - 'mobilenetv3_small_100'
+        - 'mobilenetv3_small_075'
+        - 'tf_mobilenetv3_small_minimal_100'
+        - 'efficientnet_lite0'
+
+    Args:
+        model_name: Name of the timm model architecture
+        num_classes: Number of output classes
+        pretrained: Use pretrained weights
+        dropout: Dropout rate before the classifier
+
+    Returns:
+        timm model returning logits
+    """
+    return timm.create_model(
+        model_name,
+        pretrained=pretrained,
+        num_classes=num_classes,
+        drop_rate=dropout
+    )
+
+
 class EnsembleModel(nn.Module):
     """
     Ensemble of multiple models for better performance
@@ -156,6 +191,48 @@ class EnsembleModel(nn.Module):
         return ensemble_pred
 
 
+def dihedral_views(x):
+    """
+    Stack the 8 dihedral transforms (4 rotations x optional horizontal flip) of a batch
+
+    Args:
+        x: Image batch of shape (B, C, H, W) with H == W
+
+    Returns:
+        Tensor of shape (8 * B, C, H, W), view-major
+    """
+    views = []
+    for k in range(4):
+        rotated = torch.rot90(x, k, dims=(2, 3))
+        views.append(rotated)
+        views.append(torch.flip(rotated, dims=(3,)))
+    return torch.cat(views, dim=0)
+
+
+class TTAModel(nn.Module):
+    """
+    Test-time augmentation over the 8 dihedral views
+    All views go through the wrapped model in a single batched forward pass
+    """
+
+    NUM_VIEWS = 8
+
+    def __init__(self, model: nn.Module):
+        """
+        Args:
+            model: Model returning logits of shape (B, num_classes)
+        """
+        super(TTAModel, self).__init__()
+        self.model = model
+
+    def forward(self, x):
+        batch_size = x.size(0)
+        logits = self.model(dihedral_views(x))
+
+        # Average logits over views
+        return logits.view(self.NUM_VIEWS, batch_size, -1).mean(dim=0)
+
+
 if __name__ == '__main__':
     # Test model creation
     print("Testing model creation...")
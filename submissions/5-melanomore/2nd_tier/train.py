@@ -3,18 +3,25 @@ Training script for skin cancer classification
 Includes mixed precision training, learning rate scheduling, and comprehensive logging
 """
 import os
+import math
+import random
 import argparse
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.amp import GradScaler, autocast
+from torch.utils.data import DataLoader
 from torch.utils.tensorboard import SummaryWriter
 from tqdm import tqdm
 import numpy as np
 from datetime import datetime
 
 from dataset import create_dataloaders
-from model import create_model
+from model import create_model, create_student_model
+from distill import (
+    IndexedDataset, DistillationLoss, load_or_compute_teacher_logits, align_teacher_logits,
+    export_onnx, quantize_onnx
+)
 from metrics import MetricsCalculator, AverageMeter, print_metrics_summary
 
 
@@ -62,8 +69,76 @@ class LabelSmoothingCrossEntropy(nn.Module):
         return loss.mean()
 
 
-def train_epoch(model, train_loader, criterion, optimizer, scaler, device, epoch, writer):
-    """Train for one epoch"""
+def save_training_state(path, model, optimizer, scheduler, scaler, sampler, epoch, batch,
+                        **extra):
+    """
+    Save everything needed to resume training exactly where it stopped
+
+    Args:
+        epoch: Epoch in progress
+        batch: Number of batches of that epoch already trained
+        extra: Additional bookkeeping (best metrics, patience, ...)
+    """
+    state = {
+        'epoch': epoch,
+        'batch': batch,
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+        'scheduler_state_dict': scheduler.state_dict() if scheduler else None,
+        'scaler_state_dict': scaler.state_dict(),
+        'sampler_state_dict': sampler.state_dict(),
+        'rng_state': {
+            'python': random.getstate(),
+            'numpy': np.random.get_state(),
+            'torch': torch.get_rng_state(),
+            'cuda': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+        },
+    }
+    state.update(extra)
+
+    # Write then rename so a preemption mid-save never corrupts the last checkpoint
+    tmp_path = path + '.tmp'
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_training_state(path, model, optimizer, scheduler, scaler, sampler, device):
+    """
+    Restore a checkpoint written by save_training_state
+
+    Returns:
+        The full checkpoint dict (epoch, batch and extra bookkeeping included)
+    """
+    state = torch.load(path, map_location=device, weights_only=False)
+
+    model.load_state_dict(state['model_state_dict'])
+    optimizer.load_state_dict(state['optimizer_state_dict'])
+    if scheduler is not None and state['scheduler_state_dict'] is not None:
+        scheduler.load_state_dict(state['scheduler_state_dict'])
+    scaler.load_state_dict(state['scaler_state_dict'])
+    sampler.load_state_dict(state['sampler_state_dict'])
+
+    rng_state = state['rng_state']
+    random.setstate(rng_state['python'])
+    np.random.set_state(rng_state['numpy'])
+    torch.set_rng_state(rng_state['torch'])
+    if rng_state['cuda'] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng_state['cuda'])
+
+    return state
+
+
+def train_epoch(model, train_loader, criterion, optimizer, scaler, device, epoch, writer,
+                teacher_logits=None, start_batch=0, checkpoint_fn=None, checkpoint_steps=0):
+    """
+    Train for one epoch
+
+    With teacher_logits, the loader must yield (images, labels, indices) and
+    criterion is called as criterion(outputs, teacher_logits[indices], labels)
+
+    start_batch is the number of batches already trained in this epoch (when
+    resuming); checkpoint_fn(epoch, batches_done) is called every checkpoint_steps batches.
+    """
     model.train()
 
     losses = AverageMeter()
@@ -72,16 +147,21 @@ def train_epoch(model, train_loader, criterion, optimizer, scaler, device, epoch
         class_names=train_loader.dataset.classes
     )
 
-    pbar = tqdm(train_loader, desc=f'Epoch {epoch} [Train]')
+    steps_per_epoch = math.ceil(len(train_loader.dataset) / train_loader.batch_size)
+    pbar = tqdm(train_loader, desc=f'Epoch {epoch} [Train]', initial=start_batch, total=steps_per_epoch)
 
-    for batch_idx, (images, labels) in enumerate(pbar):
-        images = images.to(device, non_blocking=True)
-        labels = labels.to(device, non_blocking=True)
+    for batch_idx, batch in enumerate(pbar, start=start_batch):
+        images = batch[0].to(device, non_blocking=True)
+        labels = batch[1].to(device, non_blocking=True)
 
         # Mixed precision training
         with autocast('cuda'):
             outputs = model(images)
-            loss = criterion(outputs, labels)
+            if teacher_logits is not None:
+                targets = teacher_logits[batch[2]].to(device, non_blocking=True)
+                loss = criterion(outputs, targets, labels)
+            else:
+                loss = criterion(outputs, labels)
 
         # Backward pass with gradient scaling
         optimizer.zero_grad()
@@ -102,10 +182,16 @@ def train_epoch(model, train_loader, criterion, optimizer, scaler, device, epoch
         })
 
         # Log to tensorboard
-        global_step = epoch * len(train_loader) + batch_idx
+        global_step = epoch * steps_per_epoch + batch_idx
         if batch_idx % 10 == 0:
             writer.add_scalar('Train/BatchLoss', loss.item(), global_step)
 
+        # Periodic mid-epoch checkpoint (not after the last batch: resuming there would
+        # run an empty epoch; the end-of-epoch checkpoint covers it)
+        if (checkpoint_fn is not None and checkpoint_steps > 0 and (batch_idx + 1) % checkpoint_steps == 0
+                and batch_idx + 1 < steps_per_epoch):
+            checkpoint_fn(epoch, batch_idx + 1)
+
     # Compute epoch metrics
     metrics = metrics_calc.compute()
 
@@ -166,6 +252,13 @@ def validate(model, val_loader, criterion, device, epoch, writer, prefix='Val'):
 
 
 def main(args):
+    # In distillation mode the trained (and saved) model is the student
+    if args.distill:
+        if not args.teacher_checkpoint:
+            raise ValueError("--teacher_checkpoint is required for distillation")
+        args.model_name = args.student_model
+        args.img_size = args.student_img_size
+
     # Set random seeds for reproducibility
     torch.manual_seed(args.seed)
     np.random.seed(args.seed)
@@ -183,9 +276,12 @@ def main(args):
         print(f"CUDA Version: {torch.version.cuda}")
         print(f"Available GPU memory: {torch.cuda.get_device_properties(0).total_memory / 1e9:.2f} GB")
 
-    # Create output directory
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    output_dir = os.path.join(args.output_dir, f'{args.model_name}_{timestamp}')
+    # Create output directory (or reuse the one of the run being resumed)
+    if args.resume:
+        output_dir = os.path.dirname(os.path.abspath(args.resume))
+    else:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_dir = os.path.join(args.output_dir, f'{args.model_name}_{timestamp}')
     os.makedirs(output_dir, exist_ok=True)
     print(f"Output directory: {output_dir}")
 
@@ -198,8 +294,11 @@ def main(args):
         root_dir=args.data_dir,
         batch_size=args.batch_size,
         img_size=args.img_size,
-        num_workers=args.num_workers
+        num_workers=args.num_workers,
+        balanced_sampling=args.balanced_sampling,
+        seed=args.seed
     )
+    train_sampler = train_loader.sampler
 
     print(f"Number of classes: {num_classes}")
     print(f"Class names: {class_names}")
@@ -207,14 +306,41 @@ def main(args):
     print(f"Val samples: {len(val_loader.dataset)}")
     print(f"Test samples: {len(test_loader.dataset)}")
 
+    # Teacher logits for distillation
+    teacher_logits = None
+    if args.distill:
+        cache_path = args.teacher_logits_cache or os.path.join(args.output_dir, 'teacher_logits.pt')
+        cache = load_or_compute_teacher_logits(
+            cache_path, args.teacher_checkpoint, os.path.join(args.data_dir, 'Skin_Cancer_FullSize'),
+            num_classes, device, batch_size=args.batch_size, num_workers=args.num_workers
+        )
+        teacher_logits = align_teacher_logits(cache, train_loader.dataset.samples)
+
+        train_loader = DataLoader(
+            IndexedDataset(train_loader.dataset),
+            batch_size=args.batch_size,
+            sampler=train_sampler,
+            num_workers=args.num_workers,
+            pin_memory=True,
+            persistent_workers=True if args.num_workers > 0 else False
+        )
+
     # Create model
     print(f"\nCreating model: {args.model_name}")
-    model = create_model(
-        model_name=args.model_name,
-        num_classes=num_classes,
-        pretrained=args.pretrained,
-        dropout=args.dropout
-    )
+    if args.distill:
+        model = create_student_model(
+            model_name=args.model_name,
+            num_classes=num_classes,
+            pretrained=args.pretrained,
+            dropout=args.dropout
+        )
+    else:
+        model = create_model(
+            model_name=args.model_name,
+            num_classes=num_classes,
+            pretrained=args.pretrained,
+            dropout=args.dropout
+        )
     model = model.to(device)
 
     total_params = sum(p.numel() for p in model.parameters())
@@ -233,6 +359,17 @@ def main(args):
         criterion = nn.CrossEntropyLoss()
         print("Using Cross Entropy Loss")
 
+    # Validation always scores the hard labels
+    val_criterion = criterion
+    if args.distill:
+        criterion = DistillationLoss(
+            criterion,
+            temperature=args.distill_temperature,
+            alpha=args.distill_alpha
+        )
+        print(f"Distilling from {args.teacher_checkpoint} "
+              f"(T={args.distill_temperature}, alpha={args.distill_alpha})")
+
     # Optimizer
     if args.optimizer == 'adamw':
         optimizer = optim.AdamW(
@@ -287,25 +424,66 @@ def main(args):
     best_val_f1 = 0.0
     best_val_acc = 0.0
     patience_counter = 0
+    start_epoch = 1
+    start_batch = 0
+
+    resume_path = os.path.join(output_dir, 'last_checkpoint.pth')
+
+    def save_resume_checkpoint(epoch, batch):
+        save_training_state(
+            resume_path, model, optimizer, scheduler, scaler, train_sampler, epoch, batch,
+            best_val_f1=best_val_f1,
+            best_val_acc=best_val_acc,
+            patience_counter=patience_counter,
+            args=args
+        )
+
+    if args.resume:
+        print(f"\nResuming from {args.resume}")
+        state = load_training_state(args.resume, model, optimizer, scheduler, scaler, train_sampler, device)
+        start_epoch = state['epoch']
+        start_batch = state['batch']
+        best_val_f1 = state['best_val_f1']
+        best_val_acc = state['best_val_acc']
+        patience_counter = state['patience_counter']
+        steps_per_epoch = math.ceil(len(train_loader.dataset) / train_loader.batch_size)
+        if start_batch >= steps_per_epoch:
+            # Older checkpoints could be saved after the last batch of an epoch
+            start_epoch, start_batch = start_epoch + 1, 0
+        print(f"Resuming at epoch {start_epoch}, batch {start_batch} (best F1 so far: {best_val_f1:.4f})")
+
+    if args.balanced_sampling:
+        print("Using class-balanced sampling")
 
     print(f"\nStarting training for {args.epochs} epochs...")
     print("=" * 80)
 
-    for epoch in range(1, args.epochs + 1):
+    epoch = start_epoch - 1
+    for epoch in range(start_epoch, args.epochs + 1):
         print(f"\nEpoch {epoch}/{args.epochs}")
         print("-" * 80)
 
+        # Sampler order depends only on (seed, epoch), so skipping consumed samples resumes mid-epoch
+        train_sampler.set_epoch(epoch)
+        if start_batch:
+            train_sampler.set_start_index(start_batch * args.batch_size)
+
         # Train
         train_loss, train_metrics = train_epoch(
-            model, train_loader, criterion, optimizer, scaler, device, epoch, writer
+            model, train_loader, criterion, optimizer, scaler, device, epoch, writer,
+            teacher_logits=teacher_logits,
+            start_batch=start_batch,
+            checkpoint_fn=save_resume_checkpoint,
+            checkpoint_steps=args.checkpoint_steps
         )
+        start_batch = 0
 
         print(f"Train Loss: {train_loss:.4f}, Accuracy: {train_metrics['accuracy']:.4f}, "
               f"F1 (Macro): {train_metrics['f1_macro']:.4f}")
 
         # Validate
         val_loss, val_metrics, val_calc = validate(
-            model, val_loader, criterion, device, epoch, writer, 'Val'
+            model, val_loader, val_criterion, device, epoch, writer, 'Val'
         )
 
         print(f"Val Loss: {val_loss:.4f}, Accuracy: {val_metrics['accuracy']:.4f}, "
@@ -367,6 +545,9 @@ def main(args):
             }
             torch.save(checkpoint, os.path.join(output_dir, f'checkpoint_epoch_{epoch}.pth'))
 
+        # Resume point: next epoch, nothing trained yet
+        save_resume_checkpoint(epoch + 1, 0)
+
         # Early stopping
         if args.early_stopping and patience_counter >= args.patience:
             print(f"\nEarly stopping triggered after {epoch} epochs")
@@ -384,7 +565,7 @@ def main(args):
     model.load_state_dict(checkpoint['model_state_dict'])
 
     test_loss, test_metrics, test_calc = validate(
-        model, test_loader, criterion, device, epoch, writer, 'Test'
+        model, test_loader, val_criterion, device, epoch, writer, 'Test'
     )
 
     print_metrics_summary(test_metrics)
@@ -417,6 +598,19 @@ def main(args):
         f.write("-" * 80 + "\n")
         f.write(test_calc.get_classification_report())
 
+    # Export the student for the edge device
+    if args.distill:
+        print("\nExporting student model...")
+        onnx_path = os.path.join(output_dir, 'student.onnx')
+        export_onnx(model, onnx_path, args.img_size)
+        if args.quantize:
+            quantize_onnx(
+                onnx_path,
+                os.path.join(output_dir, 'student_int8.onnx'),
+                val_loader,
+                num_batches=args.calibration_batches
+            )
+
     writer.close()
     print(f"\nResults saved to: {output_dir}")
 
@@ -475,6 +669,35 @@ if __name__ == '__main__':
     parser.add_argument('--label_smoothing', type=float, default=0.1,
                         help='Label smoothing parameter')
 
+    # Distillation parameters
+    parser.add_argument('--distill', action='store_true',
+                        help='Train a small student against cached teacher logits')
+    parser.add_argument('--teacher_checkpoint', type=str, default=None,
+                        help='Teacher checkpoint (best_model.pth) for distillation')
+    parser.add_argument('--teacher_logits_cache', type=str, default=None,
+                        help='Teacher logits cache file (default: <output_dir>/teacher_logits.pt)')
+    parser.add_argument('--student_model', type=str, default='mobilenetv3_small_100',
+                        help='Student model architecture')
+    parser.add_argument('--student_img_size', type=int, default=96,
+                        help='Student input image size')
+    parser.add_argument('--distill_temperature', type=float, default=4.0,
+                        help='Softmax temperature for distillation')
+    parser.add_argument('--distill_alpha', type=float, default=0.7,
+                        help='Weight of the distillation term (1 - alpha weights the hard loss)')
+    parser.add_argument('--quantize', action=argparse.BooleanOptionalAction, default=True,
+                        help='Quantize the exported student ONNX model to int8 (--no-quantize to skip, '
+                             'e.g. without onnxruntime)')
+    parser.add_argument('--calibration_batches', type=int, default=32,
+                        help='Validation batches used for quantization calibration')
+
+    # Sampling and resume parameters
+    parser.add_argument('--balanced_sampling', action='store_true',
+                        help='Sample training images inversely to their class frequency')
+    parser.add_argument('--resume', type=str, default=None,
+                        help='Resume from a last_checkpoint.pth (continues in its output directory)')
+    parser.add_argument('--checkpoint_steps', type=int, default=200,
+                        help='Write a resumable checkpoint every N training batches (0 disables)')
+
     # Other parameters
     parser.add_argument('--seed', type=int, default=42,
                         help='Random seed')
@@ -9,8 +9,9 @@ import seaborn as sns
 from PIL import Image
 from torch.utils.data import DataLoader
 import argparse
+import random
 
-from dataset import create_dataloaders, get_transforms
+from dataset import create_dataloaders, get_transforms, build_dataset_index
 from model import create_model
 
 
@@ -177,26 +178,21 @@ def visualize_predictions(model, data_loader, device, class_names, num_images=16
     return fig
 
 
-def visualize_class_distribution(data_loader, class_names, save_path=None):
+def visualize_class_distribution(dataset_index, save_path=None):
     """
     Visualize class distribution in the dataset
 
     Args:
-        data_loader: DataLoader for the dataset
-        class_names: List of class names
+        dataset_index: Index from dataset.build_dataset_index
         save_path: Path to save the plot
     """
-    # Count samples per class
-    class_counts = torch.zeros(len(class_names))
-
-    for _, labels in data_loader:
-        for label in labels:
-            class_counts[label] += 1
+    class_names = dataset_index['classes']
+    class_counts = [dataset_index['class_counts'][cls] for cls in class_names]
 
     # Plot
     fig, ax = plt.subplots(figsize=(12, 6))
 
-    bars = ax.bar(range(len(class_names)), class_counts.numpy())
+    bars = ax.bar(range(len(class_names)), class_counts)
 
     # Color bars
     colors = plt.cm.viridis(np.linspace(0, 1, len(class_names)))
@@ -226,34 +222,33 @@ def visualize_class_distribution(data_loader, class_names, save_path=None):
     return fig
 
 
-def visualize_sample_images(data_loader, class_names, samples_per_class=3, save_path=None):
+def visualize_sample_images(dataset_index, samples_per_class=3, save_path=None, img_size=384, seed=0):
     """
     Visualize sample images from each class
 
+    Only the selected files are decoded, straight from disk.
+
     Args:
-        data_loader: DataLoader for the dataset
-        class_names: List of class names
+        dataset_index: Index from dataset.build_dataset_index
         samples_per_class: Number of samples to show per class
         save_path: Path to save the visualization
+        img_size: Size of the displayed thumbnails
+        seed: Seed used to pick the samples
     """
+    class_names = dataset_index['classes']
     num_classes = len(class_names)
+    rng = random.Random(seed)
 
-    # Collect samples from each class
+    # Pick and load samples from each class
     class_samples = {i: [] for i in range(num_classes)}
 
-    for images, labels in data_loader:
-        for img, label in zip(images, labels):
-            label = label.item()
-            if len(class_samples[label]) < samples_per_class:
-                class_samples[label].append(img)
-
-        # Check if we have enough samples
-        if all(len(samples) >= samples_per_class for samples in class_samples.values()):
-            break
-
-    # Denormalize images
-    mean = torch.tensor([0.485, 0.456, 0.406]).view(3, 1, 1)
-    std = torch.tensor([0.229, 0.224, 0.225]).view(3, 1, 1)
+    for class_idx, class_name in enumerate(class_names):
+        files = dataset_index['files'][class_name]
+        for rel_path in rng.sample(files, min(samples_per_class, len(files))):
+            with Image.open(os.path.join(dataset_index['split_dir'], rel_path)) as img:
+                img.draft('RGB', (img_size, img_size))
+                img = img.convert('RGB').resize((img_size, img_size))
+                class_samples[class_idx].append(np.asarray(img))
 
     # Plot
     fig, axes = plt.subplots(num_classes, samples_per_class, figsize=(samples_per_class * 3, num_classes * 3))
@@ -266,12 +261,7 @@ def visualize_sample_images(data_loader, class_names, samples_per_class=3, save_
             ax = axes[class_idx][sample_idx] if samples_per_class > 1 else axes[class_idx]
 
             if sample_idx < len(class_samples[class_idx]):
-                img = class_samples[class_idx][sample_idx]
-                img = img * std + mean
-                img = torch.clamp(img, 0, 1)
-                img = img.permute(1, 2, 0).numpy()
-
-                ax.imshow(img)
+                ax.imshow(class_samples[class_idx][sample_idx])
 
                 if sample_idx == 0:
                     ax.set_ylabel(class_names[class_idx], fontsize=10, rotation=0, ha='right', va='center')
@@ -350,37 +340,25 @@ def main(args):
             save_path=args.output
         )
 
-    elif args.mode == 'class_distribution':
-        print("Loading data...")
-        train_loader, val_loader, test_loader, num_classes, class_names = create_dataloaders(
-            root_dir=args.data_dir,
-            batch_size=32,
-            img_size=384,
-            num_workers=args.num_workers
-        )
-
-        data_loader = {'train': train_loader, 'val': val_loader, 'test': test_loader}[args.split]
-
-        print(f"Plotting class distribution for {args.split} set...")
-        visualize_class_distribution(data_loader, class_names, args.output)
-
-    elif args.mode == 'sample_images':
-        print("Loading data...")
-        train_loader, val_loader, test_loader, num_classes, class_names = create_dataloaders(
-            root_dir=args.data_dir,
-            batch_size=32,
-            img_size=384,
-            num_workers=args.num_workers
+    elif args.mode in ('class_distribution', 'sample_images'):
+        print("Loading dataset index...")
+        split_name = {'train': 'train', 'val': 'valid', 'test': 'test'}[args.split]
+        dataset_index = build_dataset_index(
+            os.path.join(args.data_dir, 'Skin_Cancer_FullSize'),
+            split=split_name,
+            use_cache=not args.refresh_index
         )
 
-        data_loader = {'train': train_loader, 'val': val_loader, 'test': test_loader}[args.split]
-
-        print(f"Visualizing sample images from {args.split} set...")
-        visualize_sample_images(
-            data_loader, class_names,
-            samples_per_class=args.samples_per_class,
-            save_path=args.output
-        )
+        if args.mode == 'class_distribution':
+            print(f"Plotting class distribution for {args.split} set...")
+            visualize_class_distribution(dataset_index, args.output)
+        else:
+            print(f"Visualizing sample images from {args.split} set...")
+            visualize_sample_images(
+                dataset_index,
+                samples_per_class=args.samples_per_class,
+                save_path=args.output
+            )
 
     print("Done!")
 
@@ -426,6 +404,8 @@ if __name__ == '__main__':
     # Sample images
     parser.add_argument('--samples_per_class', type=int, default=3,
                         help='Number of sample images per class')
+    parser.add_argument('--refresh_index', action='store_true',
+                        help='Rebuild the cached dataset index')
 
     args = parser.parse_args()
 
@@ -785,6 +785,11 @@ def main(argv: list[str] | None = None) -> int:
     )
     parser.add_argument("--debug", action="store_true", help="Run Flask in debug mode")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose logging")
+    parser.add_argument(
+        "--tta",
+        action="store_true",
+        help="Average classifier predictions over the 8 dihedral views (one batched forward pass)",
+    )
 
     args = parser.parse_args(argv)
 
@@ -794,6 +799,9 @@ def main(argv: list[str] | None = None) -> int:
     LOGGER.info("Starting Nicla ingestion server on %s:%s", args.host, args.port)
     LOGGER.info("Saving captures to %s", args.upload_dir)
 
+    if args.tta and not _ensure_classifier().enable_tta():
+        LOGGER.warning("Test-time augmentation not available for %s", type(CLASSIFIER).__name__)
+
     # Ensure upload directory exists ahead of time
     args.upload_dir.mkdir(parents=True, exist_ok=True)
 
@@ -11,8 +11,18 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+try:
+    import torch
+    import torch.nn as nn
+
+    HAS_TORCH = True
+except ImportError:
+    HAS_TORCH = False
+
 LOGGER = logging.getLogger("nicla.classifier")
 
+TTA_NUM_VIEWS = 8
+
 
 @dataclass
 class PredictionResult:
@@ -46,6 +56,35 @@ class BaseClassifier:
         """
         raise NotImplementedError
 
+    def enable_tta(self) -> bool:
+        """
+        Enable dihedral test-time augmentation if the classifier supports it.
+        
+        Returns:
+            True if TTA is active after the call
+        """
+        return False
+
+
+if HAS_TORCH:
+
+    class DihedralTTA(nn.Module):
+        """Averages logits over the 8 dihedral views, run as one batched forward pass."""
+
+        def __init__(self, model: nn.Module):
+            super().__init__()
+            self.model = model
+
+        def forward(self, x: "torch.Tensor") -> "torch.Tensor":
+            batch_size = x.size(0)
+            views = []
+            for k in range(4):
+                rotated = torch.rot90(x, k, dims=(2, 3))
+                views.append(rotated)
+                views.append(torch.flip(rotated, dims=(3,)))
+            logits = self.model(torch.cat(views, dim=0))
+            return logits.view(TTA_NUM_VIEWS, batch_size, -1).mean(dim=0)
+
 
 class RealLesionClassifier(BaseClassifier):
     """
@@ -53,15 +92,22 @@ class RealLesionClassifier(BaseClassifier):
     Uses SkinCancerPredictor from inference_api.py
     """
     
-    def __init__(self, class_labels: List[str], model_path: Optional[Path] = None):
+    def __init__(
+        self,
+        class_labels: List[str],
+        model_path: Optional[Path] = None,
+        tta: bool = False
+    ):
         """
         Initialize the classifier with the trained model.
         
         Args:
             class_labels: List of class names (expected order)
             model_path: Path to best_model.pth file. If None, uses default location.
+            tta: Average predictions over the 8 dihedral views of the image
         """
         self.class_labels = class_labels
+        self.tta = False
         
         # Import SkinCancerPredictor
         try:
@@ -94,6 +140,30 @@ class RealLesionClassifier(BaseClassifier):
             ) from exc
         except Exception as exc:
             raise RuntimeError(f"Failed to load model: {exc}") from exc
+
+        if tta:
+            self.enable_tta()
+
+    def enable_tta(self) -> bool:
+        """
+        Wrap the predictor's network so every forward pass averages the 8 dihedral views.
+        
+        Returns:
+            True if TTA is active after the call
+        """
+        if self.tta:
+            return True
+
+        model = getattr(self.predictor, "model", None)
+        if not HAS_TORCH or not isinstance(model, nn.Module):
+            LOGGER.warning("TTA requested but the predictor does not expose a torch model; ignoring")
+            return False
+
+        self.predictor.model = DihedralTTA(model).eval()
+        self.model_version = f"{self.model_version}+tta{TTA_NUM_VIEWS}"
+        self.tta = True
+        LOGGER.info("Test-time augmentation enabled (%d dihedral views)", TTA_NUM_VIEWS)
+        return True
     
     def predict(
         self, 
@@ -113,11 +183,12 @@ class RealLesionClassifier(BaseClassifier):
         start_time = time.time()
         
         try:
-            # Run inference using the predictor
-            result = self.predictor.predict(str(image_path))
-            
-            # Get top 3 predictions for additional context
+            # Single inference pass (8 forward passes with TTA): the top-3 list already
+            # holds the argmax as its first entry, so predict() is not called separately
             top_3 = self.predictor.predict_top_k(str(image_path), k=3)
+            if not top_3:
+                raise ValueError("predictor returned no predictions")
+            best = top_3[0]
             
             # Calculate latency
             latency_ms = (time.time() - start_time) * 1000
@@ -133,8 +204,8 @@ class RealLesionClassifier(BaseClassifier):
             ]
             
             return PredictionResult(
-                label=result["predicted_class"],
-                confidence=result["confidence"],
+                label=best["class"],
+                confidence=best["confidence"],
                 provider="SkinCancerPredictor",
                 model_version=self.model_version,
                 raw_predictions=raw_predictions,
@@ -218,7 +289,8 @@ class MockLesionClassifier(BaseClassifier):
 def load_classifier(
     class_labels: List[str], 
     model_path: Optional[Path] = None,
-    force_mock: bool = False
+    force_mock: bool = False,
+    tta: bool = False
 ) -> BaseClassifier:
     """
     Load the appropriate classifier.
@@ -227,6 +299,7 @@ def load_classifier(
         class_labels: List of class names
         model_path: Optional path to the model file
         force_mock: If True, always use the mock classifier
+        tta: Enable dihedral test-time augmentation on the real classifier
         
     Returns:
         A BaseClassifier instance (Real or Mock)
@@ -236,7 +309,7 @@ def load_classifier(
         return MockLesionClassifier(class_labels)
     
     try:
-        return RealLesionClassifier(class_labels, model_path)
+        return RealLesionClassifier(class_labels, model_path, tta=tta)
     except Exception as exc:
         LOGGER.error(f"Failed to load real classifier: {exc}")
         LOGGER.warning("Falling back to MockLesionClassifier")